@@ -5,6 +5,16 @@ import { notifyUser, notifyWorkspace } from '../services/notifications.js';
 
 const router = Router();
 
+// The render server reports served artifacts as signed "/artifacts/..." URLs unless RENDER_PUBLIC_URL
+// is set. Browsers play them directly, so prefer the render server's public address over the internal one.
+function resolveRenderOutputUrl(outputUrl) {
+  const baseUrl = process.env.RENDER_SERVER_PUBLIC_URL || process.env.RENDER_SERVER_URL;
+  if (!outputUrl || !outputUrl.startsWith('/artifacts/') || !baseUrl) {
+    return outputUrl || '';
+  }
+  return `${baseUrl.replace(/\/+$/, '')}${outputUrl}`;
+}
+
 // POST /api/webhooks/stripe
 router.post('/stripe', async (req, res, next) => {
   const sig = req.headers['stripe-signature'];
@@ -153,7 +163,8 @@ router.post('/render/complete', async (req, res) => {
     return res.status(403).json({ error: 'Invalid callback key' });
   }
 
-  const { episode_id, output_url, duration_seconds } = req.body;
+  const { episode_id, duration_seconds } = req.body;
+  const output_url = resolveRenderOutputUrl(req.body.output_url);
   try {
     const pb = await getAdminPB();
     const episode = await pb.collection('episodes').getOne(episode_id);
@@ -10,6 +10,16 @@ function getPBFileUrl(record, filename) {
   return `${base}/api/files/${collection}/${record.id}/${encodeURIComponent(filename)}`;
 }
 
+// Delay before re-queuing a job the render server turned away with 429. Retry-After is either
+// delta-seconds or an HTTP date.
+function getRetryAfterMs(value, fallbackMs = 30000) {
+  const seconds = Number(value);
+  if (value !== undefined && value !== '' && Number.isFinite(seconds)) return Math.max(1000, seconds * 1000);
+  const retryAt = Date.parse(value);
+  if (!Number.isNaN(retryAt)) return Math.max(1000, retryAt - Date.now());
+  return fallbackMs;
+}
+
 function buildOrFilter(field, ids = []) {
   const values = [...new Set(ids.filter(Boolean))];
   if (values.length === 0) return '';
@@ -160,15 +170,49 @@ export function startRenderWorker() {
         callback_url: `${process.env.API_URL}/api/webhooks/render`,
         callback_key: process.env.RENDER_SERVER_CALLBACK_KEY,
         job_id: String(job.id),
+        workspace_id: workspaceId || '',
       };
 
-      await axios.post(`${renderServerUrl}/render-full-episode`, payload, {
-        headers: {
-          'X-API-Key': process.env.RENDER_API_KEY,
-          'Content-Type': 'application/json',
-        },
-        timeout: 3600000, // 1 hour
-      });
+      try {
+        await axios.post(`${renderServerUrl}/render-full-episode`, payload, {
+          headers: {
+            'X-API-Key': process.env.RENDER_API_KEY,
+            'Content-Type': 'application/json',
+          },
+          timeout: 3600000, // 1 hour
+        });
+      } catch (err) {
+        if (err.response?.status === 409) {
+          // A retry of a job the render server is already rendering; its callbacks still arrive.
+          console.log(`[renderWorker] Job ${job.id} is already running on the render server`);
+          return;
+        }
+        if (err.response?.status !== 429) throw err;
+        // The render server is at capacity: queue a fresh Bull job after Retry-After so the
+        // wait does not use up one of this job's attempts.
+        const delay = getRetryAfterMs(err.response.headers?.['retry-after']);
+        const { jobId, repeat, delay: previousDelay, ...opts } = job.opts || {};
+        const retryJob = await queue.add(job.data, { ...opts, delay });
+        if (renderJobRecord) {
+          await pb.collection('render_jobs').update(renderJobRecord.id, {
+            status: 'queued',
+            current_step: 'waiting_for_render_capacity',
+            render_server_job_id: String(retryJob.id),
+          });
+        }
+        await pb.collection('episodes').update(episodeId, {
+          status: 'RENDER_QUEUED',
+          render_job_id: String(retryJob.id),
+        });
+        await pb.collection('pipeline_logs').create({
+          episode: episodeId,
+          workspace: workspaceId,
+          event: 'render_deferred',
+          message: `Render server busy, retrying in ${Math.round(delay / 1000)}s (Bull job ${retryJob.id})`,
+        }).catch(() => {});
+        console.log(`[renderWorker] Job ${job.id} deferred by render server; re-queued as ${retryJob.id} in ${delay}ms`);
+        return;
+      }
 
       console.log(`[renderWorker] Job ${job.id} dispatched to render server`);
       // Actual completion handled via webhook callbacks
@@ -0,0 +1,65 @@
+"""Stub StudioAI API that records render-server callbacks for the benchmark harness.
+
+Accepts POST {base}/progress, /complete and /failed, stores each callback with its arrival
+time and the render server's x-render-enqueued-at header, and serves them back from
+GET /events. --delay simulates a slow API.
+
+    python bench/callback_receiver.py --port 9100 --delay 0.05
+"""
+
+import argparse
+import asyncio
+import threading
+import time
+from typing import Any
+
+import uvicorn
+from fastapi import FastAPI, Request
+
+
+def create_app(delay_seconds: float) -> FastAPI:
+    app = FastAPI(title="Render callback receiver")
+    lock = threading.Lock()
+    events: list[dict[str, Any]] = []
+
+    @app.post("/{route:path}")
+    async def receive(route: str, request: Request) -> dict[str, Any]:
+        received_at = time.time()
+        payload = await request.json()
+        try:
+            enqueued_at = float(request.headers.get("x-render-enqueued-at") or 0.0) or None
+        except ValueError:
+            enqueued_at = None
+        with lock:
+            events.append(
+                {
+                    "route": "/" + route.rsplit("/", 1)[-1],
+                    "job_id": payload.get("job_id"),
+                    "received_at": received_at,
+                    "enqueued_at": enqueued_at,
+                    "payload": payload,
+                }
+            )
+        if delay_seconds > 0:
+            await asyncio.sleep(delay_seconds)
+        return {"ok": True}
+
+    @app.get("/events")
+    def list_events(since: int = 0) -> dict[str, Any]:
+        with lock:
+            return {"next": len(events), "events": events[since:]}
+
+    return app
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=9100)
+    parser.add_argument("--delay", type=float, default=0.0, help="seconds to hold each callback before answering")
+    args = parser.parse_args()
+    uvicorn.run(create_app(args.delay), host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
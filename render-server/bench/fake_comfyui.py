@@ -0,0 +1,250 @@
+"""Stand-in ComfyUI server for benchmarking the render server without a GPU.
+
+Implements the endpoints the render server talks to (/system_stats, /object_info, /prompt,
+/history, /view, /upload/image, /queue, /interrupt and the /ws event stream). Prompts run one
+at a time, like a single ComfyUI worker, with a configurable latency, failure rate, straggler
+rate and output image size.
+
+    python bench/fake_comfyui.py --port 8188 --latency 2.0 --failure-rate 0.05 --image-size 832x480
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import threading
+import time
+import uuid
+import zlib
+from typing import Any
+
+import uvicorn
+from fastapi import FastAPI, File, Form, Request, UploadFile, WebSocket, WebSocketDisconnect
+from fastapi.responses import Response
+
+
+def encode_png(width: int, height: int, noise: bool) -> bytes:
+    def chunk(kind: bytes, data: bytes) -> bytes:
+        return len(data).to_bytes(4, "big") + kind + data + zlib.crc32(kind + data).to_bytes(4, "big")
+
+    if noise:
+        # Random pixels compress about as badly as real renders, so downloads have a realistic size.
+        raw = b"".join(b"\x00" + os.urandom(width * 3) for _ in range(height))
+    else:
+        raw = (b"\x00" + b"\x28" * (width * 3)) * height
+    header = width.to_bytes(4, "big") + height.to_bytes(4, "big") + bytes([8, 2, 0, 0, 0])
+    return b"\x89PNG\r\n\x1a\n" + chunk(b"IHDR", header) + chunk(b"IDAT", zlib.compress(raw, 1)) + chunk(b"IEND", b"")
+
+
+class FakeComfy:
+    def __init__(
+        self,
+        latency: float,
+        jitter: float,
+        failure_rate: float,
+        image: bytes,
+        straggler_rate: float = 0.0,
+        straggler_factor: float = 10.0,
+    ) -> None:
+        self.latency = latency
+        self.jitter = jitter
+        self.failure_rate = failure_rate
+        self.straggler_rate = straggler_rate
+        self.straggler_factor = straggler_factor
+        self.image = image
+        self.lock = threading.Lock()
+        self.pending: list[tuple[str, dict[str, Any], str]] = []
+        self.running: tuple[str, dict[str, Any], str] | None = None
+        self.interrupted = threading.Event()
+        self.history: dict[str, dict[str, Any]] = {}
+        self.sockets: dict[str, WebSocket] = {}
+        self.loop: asyncio.AbstractEventLoop | None = None
+        self.stats = {"prompts": 0, "completed": 0, "failed": 0, "views": 0, "uploads": 0, "history_gets": 0, "queue_gets": 0}
+
+    def send(self, client_id: str, message: dict[str, Any]) -> None:
+        socket = self.sockets.get(client_id)
+        if socket is not None and self.loop is not None:
+            asyncio.run_coroutine_threadsafe(socket.send_text(json.dumps(message)), self.loop)
+
+    def work(self) -> None:
+        while True:
+            with self.lock:
+                self.running = self.pending.pop(0) if self.pending else None
+                item = self.running
+            if item is None:
+                time.sleep(0.01)
+                continue
+            prompt_id, prompt, client_id = item
+            self.interrupted.clear()
+            self.send(client_id, {"type": "execution_start", "data": {"prompt_id": prompt_id}})
+            duration = max(0.0, random.gauss(self.latency, self.latency * self.jitter))
+            if random.random() < self.straggler_rate:
+                duration *= self.straggler_factor
+            steps = 4
+            for step in range(steps):
+                if self.interrupted.wait(duration / steps):
+                    break
+                self.send(
+                    client_id,
+                    {"type": "progress", "data": {"value": step + 1, "max": steps, "prompt_id": prompt_id, "node": "3"}},
+                )
+            self.finish(prompt_id, prompt, client_id)
+            with self.lock:
+                self.running = None
+
+    def finish(self, prompt_id: str, prompt: dict[str, Any], client_id: str) -> None:
+        if self.interrupted.is_set():
+            self.history[prompt_id] = {"outputs": {}, "status": {"status_str": "error", "completed": False}}
+            self.send(client_id, {"type": "execution_interrupted", "data": {"prompt_id": prompt_id}})
+            return
+        if random.random() < self.failure_rate:
+            self.stats["failed"] += 1
+            self.history[prompt_id] = {"outputs": {}, "status": {"status_str": "error", "completed": False}}
+            self.send(
+                client_id,
+                {"type": "execution_error", "data": {"prompt_id": prompt_id, "exception_message": "simulated failure"}},
+            )
+            return
+        batch = 1
+        output_node = "9"
+        for node_id, node in prompt.items():
+            class_type = node.get("class_type")
+            inputs = node.get("inputs") or {}
+            if class_type == "EmptyLatentImage":
+                batch = int(inputs.get("batch_size", 1))
+            elif class_type == "RepeatLatentBatch":
+                batch = int(inputs.get("amount", 1))
+            elif class_type == "SaveImage":
+                output_node = node_id
+        images = [{"filename": f"{prompt_id}-{take}.png", "subfolder": "", "type": "output"} for take in range(batch)]
+        self.stats["completed"] += 1
+        self.history[prompt_id] = {"outputs": {output_node: {"images": images}}, "status": {"status_str": "success", "completed": True}}
+        self.send(client_id, {"type": "executed", "data": {"node": output_node, "prompt_id": prompt_id, "output": {"images": images}}})
+        self.send(client_id, {"type": "executing", "data": {"node": None, "prompt_id": prompt_id}})
+
+
+def create_app(fake: FakeComfy) -> FastAPI:
+    app = FastAPI(title="Fake ComfyUI")
+
+    @app.on_event("startup")
+    async def start_worker() -> None:
+        fake.loop = asyncio.get_running_loop()
+        threading.Thread(target=fake.work, name="fake-comfy-worker", daemon=True).start()
+
+    @app.get("/system_stats")
+    def system_stats() -> dict[str, Any]:
+        return {
+            "system": {"os": "posix", "comfyui_version": "fake-bench", "python_version": "3"},
+            "devices": [{"name": "fake-gpu", "type": "cuda", "vram_total": 24 * 1024**3, "vram_free": 20 * 1024**3}],
+        }
+
+    @app.get("/object_info")
+    @app.get("/object_info/{node_class}")
+    def object_info(node_class: str = "CheckpointLoaderSimple") -> dict[str, Any]:
+        return {node_class: {"input": {"required": {"ckpt_name": [["bench.safetensors", "bench-alt.safetensors"]]}}}}
+
+    @app.post("/prompt")
+    async def queue_prompt(request: Request) -> dict[str, Any]:
+        body = await request.json()
+        prompt_id = body.get("prompt_id") or str(uuid.uuid4())
+        with fake.lock:
+            fake.stats["prompts"] += 1
+            fake.pending.append((prompt_id, body.get("prompt") or {}, body.get("client_id") or ""))
+            number = len(fake.pending)
+        return {"prompt_id": prompt_id, "number": number, "node_errors": {}}
+
+    @app.get("/history/{prompt_id}")
+    def history(prompt_id: str) -> dict[str, Any]:
+        fake.stats["history_gets"] += 1
+        return {prompt_id: fake.history[prompt_id]} if prompt_id in fake.history else {}
+
+    @app.get("/queue")
+    def get_queue() -> dict[str, Any]:
+        fake.stats["queue_gets"] += 1
+        with fake.lock:
+            running = [[0, fake.running[0], {}, {}, []]] if fake.running else []
+            pending = [[i + 1, item[0], {}, {}, []] for i, item in enumerate(fake.pending)]
+        return {"queue_running": running, "queue_pending": pending}
+
+    @app.post("/queue")
+    async def edit_queue(request: Request) -> dict[str, Any]:
+        body = await request.json()
+        with fake.lock:
+            if body.get("clear"):
+                fake.pending.clear()
+            delete = set(body.get("delete") or [])
+            fake.pending[:] = [item for item in fake.pending if item[0] not in delete]
+        return {}
+
+    @app.post("/interrupt")
+    def interrupt() -> dict[str, Any]:
+        fake.interrupted.set()
+        return {}
+
+    @app.get("/view")
+    def view(filename: str, subfolder: str = "", type: str = "output") -> Response:
+        fake.stats["views"] += 1
+        return Response(fake.image, media_type="image/png")
+
+    @app.post("/upload/image")
+    async def upload_image(
+        image: UploadFile = File(...), type: str = Form("input"), overwrite: str = Form("false")
+    ) -> dict[str, Any]:
+        fake.stats["uploads"] += 1
+        await image.read()
+        return {"name": image.filename, "subfolder": "", "type": type}
+
+    @app.get("/bench/stats")
+    def bench_stats() -> dict[str, Any]:
+        with fake.lock:
+            return {**fake.stats, "pending": len(fake.pending)}
+
+    @app.websocket("/ws")
+    async def events(websocket: WebSocket, clientId: str = "") -> None:
+        await websocket.accept()
+        fake.sockets[clientId] = websocket
+        try:
+            while True:
+                await websocket.receive_text()
+        except WebSocketDisconnect:
+            pass
+        finally:
+            if fake.sockets.get(clientId) is websocket:
+                fake.sockets.pop(clientId, None)
+
+    return app
+
+
+def parse_size(value: str) -> tuple[int, int]:
+    width, _, height = value.lower().partition("x")
+    return max(1, int(width)), max(1, int(height or width))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8188)
+    parser.add_argument("--latency", type=float, default=1.0, help="mean seconds per prompt")
+    parser.add_argument("--jitter", type=float, default=0.1, help="latency standard deviation as a fraction of --latency")
+    parser.add_argument("--failure-rate", type=float, default=0.0, help="fraction of prompts that end in execution_error")
+    parser.add_argument("--straggler-rate", type=float, default=0.0, help="fraction of prompts that run --straggler-factor times longer")
+    parser.add_argument("--straggler-factor", type=float, default=10.0)
+    parser.add_argument("--image-size", default="832x480", help="WIDTHxHEIGHT of the PNG returned by /view")
+    parser.add_argument("--flat-image", action="store_true", help="serve a flat (highly compressible) image instead of noise")
+    args = parser.parse_args()
+
+    width, height = parse_size(args.image_size)
+    fake = FakeComfy(
+        args.latency,
+        args.jitter,
+        args.failure_rate,
+        encode_png(width, height, noise=not args.flat_image),
+        straggler_rate=args.straggler_rate,
+        straggler_factor=args.straggler_factor,
+    )
+    uvicorn.run(create_app(fake), host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,358 @@
+"""Throughput benchmark for the render server against stand-in ComfyUI nodes.
+
+Starts N fake ComfyUI nodes (bench/fake_comfyui.py), a callback receiver
+(bench/callback_receiver.py) and the render server (uvicorn main:app) on local ports. For
+every storyboard size x concurrency combination it submits that many jobs at once to
+/render-full-episode and waits for their terminal callbacks. It then reports:
+
+- shots/sec across the scenario
+- end-to-end job latency percentiles (submit -> /complete received)
+- callback overhead (render server enqueue -> receiver arrival) and callbacks per job
+- assembly time (assembling_video progress -> /complete received, i.e. ffmpeg + artifact store)
+
+    cd render-server
+    python bench/run_bench.py --shots 8,32 --concurrency 1,4 --nodes 2 --latency 0.5
+
+Keyframe caching is disabled so every shot reaches a fake node. Set FFMPEG_PATH to include
+real encoding in the assembly time; without ffmpeg the server writes an empty video.
+Use --json to save the results for comparing runs.
+"""
+
+import argparse
+import json
+import math
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import uuid
+from pathlib import Path
+from typing import Any
+
+import requests
+
+BENCH_DIR = Path(__file__).resolve().parent
+SERVER_DIR = BENCH_DIR.parent
+
+
+def percentile(values: list[float], pct: float) -> float | None:
+    if not values:
+        return None
+    ordered = sorted(values)
+    rank = max(0, min(len(ordered) - 1, math.ceil(pct / 100 * len(ordered)) - 1))
+    return ordered[rank]
+
+
+def wait_for_http(url: str, timeout_seconds: float) -> None:
+    deadline = time.time() + timeout_seconds
+    while time.time() < deadline:
+        try:
+            if requests.get(url, timeout=1).status_code < 500:
+                return
+        except requests.RequestException:
+            pass
+        time.sleep(0.1)
+    raise RuntimeError(f"{url} did not come up within {timeout_seconds:.0f}s")
+
+
+class Processes:
+    def __init__(self, log_dir: Path) -> None:
+        self.log_dir = log_dir
+        self.procs: list[subprocess.Popen] = []
+
+    def start(self, name: str, args: list[str], env: dict[str, str] | None = None, cwd: Path | None = None) -> None:
+        log = (self.log_dir / f"{name}.log").open("wb")
+        self.procs.append(
+            subprocess.Popen(args, stdout=log, stderr=subprocess.STDOUT, env=env, cwd=str(cwd) if cwd else None)
+        )
+
+    def stop(self) -> None:
+        for proc in self.procs:
+            proc.terminate()
+        for proc in self.procs:
+            try:
+                proc.wait(timeout=5)
+            except subprocess.TimeoutExpired:
+                proc.kill()
+
+
+def build_request(job_id: str, shots: int, callback_url: str, reference_url: str | None) -> dict[str, Any]:
+    return {
+        "episode_id": f"bench-{job_id}",
+        "title": "Benchmark Episode",
+        "style": "flat colour cartoon",
+        "storyboard": [
+            {
+                "scene": 1 + i // 4,
+                "shot_index": i % 4,
+                "duration_sec": 2,
+                "camera": "medium",
+                "action": f"synthetic action {i}",
+                "emotion": ["happy", "sad", "surprised", "neutral"][i % 4],
+                "focus_character": "Bench",
+            }
+            for i in range(shots)
+        ],
+        "characters": [
+            {"name": "Bench", "role": "main", "positive_prompt": "test character", "reference_image_url": reference_url}
+        ],
+        "render": {"keyframe_cache": False},
+        "callback_url": callback_url,
+        "callback_key": "bench",
+        "job_id": job_id,
+        "workspace_id": f"bench-{job_id}",
+    }
+
+
+def run_scenario(
+    server_url: str,
+    receiver_url: str,
+    node_urls: list[str],
+    shots: int,
+    concurrency: int,
+    timeout_seconds: float,
+    api_key: str,
+    with_references: bool,
+) -> dict[str, Any]:
+    since = requests.get(f"{receiver_url}/events", timeout=5).json()["next"]
+    prompts_before = sum(requests.get(f"{url}/bench/stats", timeout=5).json()["prompts"] for url in node_urls)
+    callback_url = f"{receiver_url}/api/webhooks/render"
+    reference_url = f"{node_urls[0]}/view?filename=bench-reference.png" if with_references else None
+    job_ids = [f"{shots}x{concurrency}-{i}-{uuid.uuid4().hex[:6]}" for i in range(concurrency)]
+    submitted_at: dict[str, float] = {}
+    errors: list[str] = []
+
+    def submit(job_id: str) -> None:
+        submitted_at[job_id] = time.time()
+        response = requests.post(
+            f"{server_url}/render-full-episode",
+            json=build_request(job_id, shots, callback_url, reference_url),
+            headers={"x-api-key": api_key} if api_key else {},
+            timeout=30,
+        )
+        if response.status_code >= 400:
+            errors.append(f"{job_id}: HTTP {response.status_code} {response.text[:200]}")
+
+    threads = [threading.Thread(target=submit, args=(job_id,)) for job_id in job_ids]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    events: list[dict[str, Any]] = []
+    terminal: dict[str, dict[str, Any]] = {}
+    deadline = time.time() + timeout_seconds
+    pending = set(job_ids) - {error.split(":", 1)[0] for error in errors}
+    while pending and time.time() < deadline:
+        batch = requests.get(f"{receiver_url}/events", params={"since": since}, timeout=5).json()
+        since = batch["next"]
+        for event in batch["events"]:
+            if event["job_id"] not in submitted_at:
+                continue
+            events.append(event)
+            if event["route"] in {"/complete", "/failed"}:
+                terminal[event["job_id"]] = event
+                pending.discard(event["job_id"])
+        time.sleep(0.1)
+    errors.extend(f"{job_id}: timed out" for job_id in sorted(pending))
+
+    completed = [job_id for job_id, event in terminal.items() if event["route"] == "/complete"]
+    failed = [job_id for job_id, event in terminal.items() if event["route"] == "/failed"]
+    errors.extend(f"{job_id}: {terminal[job_id]['payload'].get('error_message')}" for job_id in failed)
+    latencies = [terminal[job_id]["received_at"] - submitted_at[job_id] for job_id in completed]
+    callback_delays = [event["received_at"] - event["enqueued_at"] for event in events if event.get("enqueued_at")]
+    assembly_times: list[float] = []
+    for job_id in completed:
+        assembling = [
+            event["received_at"]
+            for event in events
+            if event["job_id"] == job_id and event["payload"].get("current_step") == "assembling_video"
+        ]
+        if assembling:
+            assembly_times.append(terminal[job_id]["received_at"] - assembling[-1])
+    wall = (max(event["received_at"] for event in terminal.values()) - min(submitted_at.values())) if terminal else 0.0
+    prompts_after = sum(requests.get(f"{url}/bench/stats", timeout=5).json()["prompts"] for url in node_urls)
+
+    return {
+        "shots": shots,
+        "concurrency": concurrency,
+        "completed_jobs": len(completed),
+        "failed_jobs": len(failed) + len(pending),
+        "wall_seconds": round(wall, 3),
+        "shots_per_second": round(len(completed) * shots / wall, 3) if wall else 0.0,
+        "latency_seconds": {
+            "p50": percentile(latencies, 50),
+            "p90": percentile(latencies, 90),
+            "p99": percentile(latencies, 99),
+            "max": max(latencies) if latencies else None,
+        },
+        "callbacks": {
+            "per_job": round(len(events) / max(1, len(job_ids)), 1),
+            "delay_mean_seconds": sum(callback_delays) / len(callback_delays) if callback_delays else None,
+            "delay_p95_seconds": percentile(callback_delays, 95),
+            "delay_max_seconds": max(callback_delays) if callback_delays else None,
+        },
+        "assembly_seconds": {
+            "mean": sum(assembly_times) / len(assembly_times) if assembly_times else None,
+            "max": max(assembly_times) if assembly_times else None,
+        },
+        "comfy_prompts": prompts_after - prompts_before,
+        "errors": errors[:20],
+    }
+
+
+def format_seconds(value: float | None) -> str:
+    return "-" if value is None else f"{value:.3f}"
+
+
+def print_report(results: list[dict[str, Any]]) -> None:
+    header = (
+        f"{'shots':>5} {'conc':>4} {'ok':>3} {'fail':>4} {'wall s':>8} {'shots/s':>8} "
+        f"{'p50 s':>8} {'p90 s':>8} {'p99 s':>8} {'cb/job':>6} {'cb mean':>8} {'cb p95':>8} {'asm mean':>8} {'asm max':>8}"
+    )
+    print(header)
+    print("-" * len(header))
+    for result in results:
+        latency = result["latency_seconds"]
+        callbacks = result["callbacks"]
+        assembly = result["assembly_seconds"]
+        print(
+            f"{result['shots']:>5} {result['concurrency']:>4} {result['completed_jobs']:>3} {result['failed_jobs']:>4} "
+            f"{result['wall_seconds']:>8.2f} {result['shots_per_second']:>8.2f} "
+            f"{format_seconds(latency['p50']):>8} {format_seconds(latency['p90']):>8} {format_seconds(latency['p99']):>8} "
+            f"{callbacks['per_job']:>6} {format_seconds(callbacks['delay_mean_seconds']):>8} "
+            f"{format_seconds(callbacks['delay_p95_seconds']):>8} "
+            f"{format_seconds(assembly['mean']):>8} {format_seconds(assembly['max']):>8}"
+        )
+        for error in result["errors"]:
+            print(f"      ! {error}")
+
+
+def parse_int_list(value: str) -> list[int]:
+    return [int(part) for part in value.split(",") if part.strip()]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--shots", default="8,32", help="comma-separated storyboard sizes")
+    parser.add_argument("--concurrency", default="1,4", help="comma-separated numbers of jobs submitted at once")
+    parser.add_argument("--nodes", type=int, default=1, help="number of fake ComfyUI nodes")
+    parser.add_argument("--latency", type=float, default=0.5, help="fake ComfyUI seconds per prompt")
+    parser.add_argument("--jitter", type=float, default=0.1)
+    parser.add_argument("--failure-rate", type=float, default=0.0)
+    parser.add_argument("--straggler-rate", type=float, default=0.0, help="fraction of prompts that stall (see fake_comfyui.py)")
+    parser.add_argument("--image-size", default="832x480")
+    parser.add_argument("--callback-delay", type=float, default=0.0, help="seconds the stub API holds each callback")
+    parser.add_argument("--references", action="store_true", help="give the character a reference image (img2img path)")
+    parser.add_argument("--base-port", type=int, default=18180)
+    parser.add_argument("--timeout", type=float, default=600.0, help="seconds to wait for each scenario")
+    parser.add_argument("--env", action="append", default=[], metavar="KEY=VALUE", help="extra render server env")
+    parser.add_argument("--json", dest="json_path", help="write results to this file")
+    args = parser.parse_args()
+
+    shot_counts = parse_int_list(args.shots)
+    concurrency_levels = parse_int_list(args.concurrency)
+    work_dir = Path(tempfile.mkdtemp(prefix="studioai-bench-"))
+    processes = Processes(work_dir)
+    node_urls = [f"http://127.0.0.1:{args.base_port + i}" for i in range(args.nodes)]
+    receiver_port = args.base_port + args.nodes
+    server_port = receiver_port + 1
+    receiver_url = f"http://127.0.0.1:{receiver_port}"
+    server_url = f"http://127.0.0.1:{server_port}"
+
+    server_env = {
+        **os.environ,
+        "COMFYUI_URLS": ",".join(node_urls),
+        "COMFYUI_URL": "",
+        "COMFYUI_WORKFLOW_PATH": "",
+        "COMFYUI_CHECKPOINT": "",
+        "RENDER_KEYFRAME_CACHE": "false",
+        "RENDER_MAX_CONCURRENT_JOBS": str(max(concurrency_levels)),
+        "RENDER_MAX_PENDING_JOBS": str(max(concurrency_levels) * 2),
+        "RENDER_MAX_INFLIGHT_SHOTS": str(max(3, args.nodes * 2)),
+        "RENDER_WORKSPACE_DIR": str(work_dir / "workspaces"),
+        "RENDER_ARTIFACT_STORE": "local",
+        "RENDER_ARTIFACT_DIR": str(work_dir / "artifacts"),
+        "RENDER_REFERENCE_CACHE_DIR": str(work_dir / "references"),
+        "RENDER_KEYFRAME_CACHE_DIR": str(work_dir / "keyframes"),
+        "RENDER_CALLBACK_SPOOL_DIR": "",
+    }
+    for item in args.env:
+        key, _, value = item.partition("=")
+        server_env[key] = value
+
+    try:
+        for i, url in enumerate(node_urls):
+            processes.start(
+                f"comfy-{i}",
+                [
+                    sys.executable,
+                    str(BENCH_DIR / "fake_comfyui.py"),
+                    "--port",
+                    url.rsplit(":", 1)[1],
+                    "--latency",
+                    str(args.latency),
+                    "--jitter",
+                    str(args.jitter),
+                    "--failure-rate",
+                    str(args.failure_rate),
+                    "--straggler-rate",
+                    str(args.straggler_rate),
+                    "--image-size",
+                    args.image_size,
+                ],
+            )
+        processes.start(
+            "callbacks",
+            [sys.executable, str(BENCH_DIR / "callback_receiver.py"), "--port", str(receiver_port), "--delay", str(args.callback_delay)],
+        )
+        processes.start(
+            "render-server",
+            [sys.executable, "-m", "uvicorn", "main:app", "--host", "127.0.0.1", "--port", str(server_port)],
+            env=server_env,
+            cwd=SERVER_DIR,
+        )
+        for url in [*node_urls, receiver_url]:
+            wait_for_http(f"{url}/bench/stats" if url in node_urls else f"{url}/events", 30)
+        wait_for_http(f"{server_url}/health", 60)
+
+        print(
+            f"nodes={args.nodes} latency={args.latency}s failure_rate={args.failure_rate} "
+            f"straggler_rate={args.straggler_rate} image={args.image_size} "
+            f"callback_delay={args.callback_delay}s logs={work_dir}"
+        )
+        results = [
+            run_scenario(
+                server_url,
+                receiver_url,
+                node_urls,
+                shots,
+                concurrency,
+                args.timeout,
+                server_env.get("RENDER_API_KEY", ""),
+                args.references,
+            )
+            for shots in shot_counts
+            for concurrency in concurrency_levels
+        ]
+    finally:
+        processes.stop()
+
+    print_report(results)
+    if args.json_path:
+        Path(args.json_path).write_text(
+            json.dumps(
+                {
+                    "config": {key: value for key, value in vars(args).items() if key != "json_path"},
+                    "results": results,
+                },
+                indent=2,
+            ),
+            encoding="utf-8",
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -1,31 +1,59 @@
-﻿import copy
+﻿import contextvars
 import hashlib
+import hmac
+import http.cookiejar
+import io
 import json
+import math
 import mimetypes
 import os
+import re
 import shutil
 import subprocess
 import tempfile
+import threading
 import time
 import uuid
+import zlib
+from collections import OrderedDict, deque
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from contextlib import contextmanager
+from dataclasses import dataclass
+from functools import lru_cache
 from pathlib import Path
-from typing import Any
-from urllib.parse import urlparse
+from typing import Any, Callable, Iterator
+from urllib.parse import quote, urlparse
 
 import requests
 from dotenv import load_dotenv
-from fastapi import BackgroundTasks, FastAPI, Header, HTTPException
+from requests.adapters import HTTPAdapter
+from fastapi import FastAPI, Header, HTTPException, Request, Response
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel, Field
 
+try:
+    import websocket
+except ImportError:  # websocket-client is optional; completion tracking falls back to /history polling.
+    websocket = None
+
+try:
+    from PIL import Image, ImageDraw, ImageFont
+except ImportError:  # Pillow is optional; title frames fall back to ffmpeg drawtext.
+    Image = ImageDraw = ImageFont = None
+
+try:
+    import boto3
+    from boto3.s3.transfer import TransferConfig
+    from botocore.exceptions import ClientError
+except ImportError:  # boto3 is optional; only RENDER_ARTIFACT_STORE=s3 needs it.
+    boto3 = None
+
 load_dotenv()
 
 app = FastAPI(title="StudioAI Render Server", version="0.2.0")
 DEFAULT_COMFYUI_URLS = ("http://127.0.0.1:8000", "http://127.0.0.1:8188")
-TRANSPARENT_1PX_PNG = (
-    b"\x89PNG\r\n\x1a\n\x00\x00\x00\rIHDR\x00\x00\x00\x01\x00\x00\x00\x01\x08\x06"
-    b"\x00\x00\x00\x1f\x15\xc4\x89\x00\x00\x00\rIDATx\x9cc`\x00\x02\x00\x00\x05"
-    b"\x00\x01\r\n-\xb4\x00\x00\x00\x00IEND\xaeB`\x82"
-)
+FALLBACK_FRAME_COLOUR = "#000000"
+TITLE_FRAME_COLOUR = "#111827"
 
 
 class VoiceAssignmentPayload(BaseModel):
@@ -73,6 +101,7 @@ class ShotPayload(BaseModel):
     prompt_negative: str = ""
     focus_character: str = ""
     seed: int | None = None
+    selected_take: int | None = None
 
 
 class RenderRequest(BaseModel):
@@ -90,6 +119,17 @@ class RenderRequest(BaseModel):
     callback_url: str
     callback_key: str
     job_id: str
+    workspace_id: str = ""
+    priority: str | int = "normal"
+    resume: bool = False
+
+
+class RenderPlanRequest(RenderRequest):
+    """Body of POST /render-plan: a RenderRequest that is only compiled, so it needs no callback."""
+
+    callback_url: str = ""
+    callback_key: str = ""
+    job_id: str = ""
 
 
 def normalize_url(url: str) -> str:
@@ -150,12 +190,90 @@ def get_render_config(overrides: dict[str, Any] | None = None) -> dict[str, Any]
             overrides.get("require_ffmpeg", os.getenv("RENDER_REQUIRE_FFMPEG", "false")),
             False,
         ),
+        "max_inflight_shots": min(
+            16, max(1, parse_int(overrides.get("max_inflight_shots", os.getenv("RENDER_MAX_INFLIGHT_SHOTS", 3)), 3))
+        ),
+        "keyframe_cache": parse_bool(overrides.get("keyframe_cache", os.getenv("RENDER_KEYFRAME_CACHE", "true")), True),
+        "assembly_mode": parse_assembly_mode(overrides.get("assembly_mode", os.getenv("RENDER_ASSEMBLY_MODE"))),
+        "segment_shots": max(0, parse_int(overrides.get("segment_shots", os.getenv("RENDER_SEGMENT_SHOTS", 0)), 0)),
+        "takes_per_shot": min(
+            8, max(1, parse_int(overrides.get("takes_per_shot", os.getenv("RENDER_TAKES_PER_SHOT", 1)), 1))
+        ),
+        "encoder_profile": parse_encoder_profile(
+            overrides.get("encoder_profile", os.getenv("RENDER_ENCODER_PROFILE"))
+        ),
+        "hedge_shots": parse_bool(overrides.get("hedge_shots", os.getenv("RENDER_HEDGE_SHOTS", "true")), True),
+        "hedge_percentile": min(
+            99.9, max(50.0, parse_float(overrides.get("hedge_percentile", os.getenv("RENDER_HEDGE_PERCENTILE", 95)), 95.0))
+        ),
+        "hedge_multiplier": max(
+            1.0, parse_float(overrides.get("hedge_multiplier", os.getenv("RENDER_HEDGE_MULTIPLIER", 1.5)), 1.5)
+        ),
+        "hedge_min_seconds": max(
+            1.0, parse_float(overrides.get("hedge_min_seconds", os.getenv("RENDER_HEDGE_MIN_SECONDS", 20)), 20.0)
+        ),
     }
 
 
+# libx264 settings for slideshow-style output. max_threads caps a single encode (0 = the pool's share).
+ENCODER_PROFILES: dict[str, dict[str, Any]] = {
+    "fast": {"preset": "veryfast", "crf": 26, "tune": "stillimage", "gop_seconds": 10, "max_threads": 2},
+    "balanced": {"preset": "medium", "crf": 21, "tune": "stillimage", "gop_seconds": 5, "max_threads": 4},
+    "archival": {"preset": "slow", "crf": 16, "tune": "stillimage", "gop_seconds": 2, "max_threads": 0},
+}
+
+
+def parse_encoder_profile(value: Any) -> str:
+    profile = str(value or "").strip().lower()
+    return profile if profile in ENCODER_PROFILES else "balanced"
+
+
+def parse_assembly_mode(value: Any) -> str:
+    mode = str(value or "").strip().lower()
+    return mode if mode in {"single", "segmented"} else "segmented"
+
+
+# Keep-alive connection pools per traffic class. RENDER_HTTP_POOL_HOSTS is the number of hosts kept
+# per session and <ENV>_HTTP_POOL_SIZE the connections kept per host; timeouts are (connect, read).
+HTTP_CLIENT_DEFAULTS: dict[str, dict[str, Any]] = {
+    "comfy": {"env": "COMFYUI", "pool_size": 16, "connect_timeout": 4.0, "read_timeout": 30.0},
+    "callback": {"env": "CALLBACK", "pool_size": 4, "connect_timeout": 5.0, "read_timeout": 20.0},
+    "reference": {"env": "REFERENCE", "pool_size": 4, "connect_timeout": 5.0, "read_timeout": 30.0},
+}
+_http_sessions: dict[str, requests.Session] = {}
+_http_sessions_lock = threading.Lock()
+
+
+def get_http_session(kind: str) -> requests.Session:
+    # urllib3 pools are thread-safe; cookies are disabled so the shared session carries no mutable state.
+    with _http_sessions_lock:
+        session = _http_sessions.get(kind)
+        if session is None:
+            defaults = HTTP_CLIENT_DEFAULTS[kind]
+            pool_size = max(1, parse_int(os.getenv(f"{defaults['env']}_HTTP_POOL_SIZE"), defaults["pool_size"]))
+            pool_hosts = max(1, parse_int(os.getenv("RENDER_HTTP_POOL_HOSTS"), 8))
+            adapter = HTTPAdapter(pool_connections=pool_hosts, pool_maxsize=pool_size, max_retries=0)
+            session = requests.Session()
+            session.cookies.set_policy(http.cookiejar.DefaultCookiePolicy(allowed_domains=[]))
+            session.mount("http://", adapter)
+            session.mount("https://", adapter)
+            _http_sessions[kind] = session
+        return session
+
+
+def get_http_timeout(kind: str, read_timeout: float | None = None) -> tuple[float, float]:
+    defaults = HTTP_CLIENT_DEFAULTS[kind]
+    connect = max(0.5, parse_float(os.getenv(f"{defaults['env']}_HTTP_CONNECT_TIMEOUT_SECONDS"), defaults["connect_timeout"]))
+    if read_timeout is None:
+        read_timeout = max(1.0, parse_float(os.getenv(f"{defaults['env']}_HTTP_TIMEOUT_SECONDS"), defaults["read_timeout"]))
+    return connect, float(read_timeout)
+
+
 def get_comfy_system_stats(base_url: str) -> dict[str, Any] | None:
     try:
-        response = requests.get(f"{normalize_url(base_url)}/system_stats", timeout=4)
+        response = get_http_session("comfy").get(
+            f"{normalize_url(base_url)}/system_stats", timeout=get_http_timeout("comfy", 4)
+        )
         if response.status_code >= 400:
             return None
         return response.json()
@@ -163,7 +281,7 @@ def get_comfy_system_stats(base_url: str) -> dict[str, Any] | None:
         return None
 
 
-def resolve_comfyui_url(explicit_url: str | None = None) -> tuple[str | None, dict[str, Any] | None]:
+def get_comfyui_candidate_urls(explicit_url: str | None = None) -> list[str]:
     candidates: list[str] = []
     for candidate in [explicit_url, os.getenv("COMFYUI_URL"), *DEFAULT_COMFYUI_URLS]:
         if not candidate:
@@ -171,33 +289,752 @@ def resolve_comfyui_url(explicit_url: str | None = None) -> tuple[str | None, di
         normalized = normalize_url(candidate)
         if normalized not in candidates:
             candidates.append(normalized)
+    return candidates
+
+
+def get_comfyui_pool_urls() -> list[str]:
+    configured = [normalize_url(u.strip()) for u in (os.getenv("COMFYUI_URLS") or "").split(",") if u.strip()]
+    return list(dict.fromkeys(configured))
+
 
-    for candidate in candidates:
-        stats = get_comfy_system_stats(candidate)
-        if stats is not None:
-            return candidate, stats
-    return None, None
+def resolve_comfyui_url(refresh: bool = False) -> tuple[str | None, dict[str, Any] | None]:
+    pool = get_comfy_pool()
+    if refresh:
+        pool.probe_all()
+    node = pool.primary_node()
+    if not node:
+        return None, None
+    return node.url, node.stats
 
 
 def comfy_get_json(comfyui_url: str, path: str, params: dict[str, Any] | None = None, timeout: int = 10) -> dict[str, Any]:
-    response = requests.get(f"{normalize_url(comfyui_url)}{path}", params=params, timeout=timeout)
+    response = get_http_session("comfy").get(
+        f"{normalize_url(comfyui_url)}{path}", params=params, timeout=get_http_timeout("comfy", timeout)
+    )
     response.raise_for_status()
     return response.json()
 
 
 def comfy_post_json(comfyui_url: str, path: str, payload: dict[str, Any], timeout: int = 30) -> dict[str, Any]:
-    response = requests.post(f"{normalize_url(comfyui_url)}{path}", json=payload, timeout=timeout)
+    response = get_http_session("comfy").post(
+        f"{normalize_url(comfyui_url)}{path}", json=payload, timeout=get_http_timeout("comfy", timeout)
+    )
     response.raise_for_status()
     return response.json()
 
 
-def send_callback(base_url: str, callback_key: str, route: str, payload: dict[str, Any]) -> None:
-    url = f"{base_url.rstrip('/')}/{route.lstrip('/')}"
-    headers = {"x-render-server-key": callback_key, "Content-Type": "application/json"}
+def fetch_comfy_checkpoints(comfyui_url: str) -> list[str] | None:
     try:
-        requests.post(url, json=payload, headers=headers, timeout=20)
-    except Exception as err:
-        print(f"[render-server] callback failed {route}: {err}")
+        info = comfy_get_json(comfyui_url, "/object_info/CheckpointLoaderSimple", timeout=10)
+    except Exception:
+        return None
+    values = (((info.get("CheckpointLoaderSimple") or {}).get("input") or {}).get("required") or {}).get("ckpt_name") or []
+    if values and isinstance(values[0], list):
+        return [str(value) for value in values[0]]
+    return []
+
+
+class ComfyNode:
+    def __init__(self, url: str) -> None:
+        self.url = normalize_url(url)
+        self.healthy = False
+        self.probed = False
+        self.stats: dict[str, Any] | None = None
+        self.checkpoints: list[str] | None = None
+        self.probed_at = 0.0
+        self.failures = 0
+        self.last_error = ""
+        self.retry_at = 0.0
+        self.inflight = 0
+        self.queue_depth = 0
+        self.queue_checked_at = 0.0
+        self.dispatched_since_check = 0
+        self.uploaded_references: dict[str, str] = {}
+        self.loaded_models: str | None = None
+
+    def describe(self) -> dict[str, Any]:
+        return {
+            "url": self.url,
+            "healthy": self.healthy,
+            "comfyui_version": (self.stats or {}).get("system", {}).get("comfyui_version"),
+            "devices": (self.stats or {}).get("devices", []) if self.healthy else [],
+            "checkpoints": self.checkpoints if self.healthy else None,
+            "probed_at": self.probed_at or None,
+            "queue_depth": self.queue_depth,
+            "inflight": self.inflight,
+            "loaded_models": self.loaded_models,
+            "failures": self.failures,
+            "last_error": self.last_error,
+            "retry_at": self.retry_at if not self.healthy else None,
+        }
+
+
+class ComfyNodePool:
+    """ComfyUI nodes that shots are dispatched across, least-queued first.
+
+    With COMFYUI_URLS unset the pool holds the classic candidate list
+    (COMFYUI_URL, :8000, :8188) and only the first reachable one is used.
+
+    Once start_prober() runs, every node is re-probed on an interval in the background
+    and callers read the cached snapshot instead of probing inline.
+    """
+
+    QUEUE_DEPTH_TTL_SECONDS = 1.0
+
+    def __init__(self, urls: list[str], first_reachable_only: bool = False) -> None:
+        self.nodes = [ComfyNode(url) for url in urls]
+        self.first_reachable_only = first_reachable_only
+        self.retry_base_seconds = max(1.0, parse_float(os.getenv("COMFYUI_NODE_RETRY_SECONDS", 5), 5.0))
+        self.affinity_max_queue_gap = max(0, parse_int(os.getenv("COMFYUI_AFFINITY_MAX_QUEUE_GAP", 2), 2))
+        self._lock = threading.Lock()
+        self._upload_locks: dict[tuple[str, str], threading.Lock] = {}
+        self._prober: threading.Thread | None = None
+        self._prober_stop = threading.Event()
+
+    def probe(self, node: ComfyNode) -> bool:
+        stats = get_comfy_system_stats(node.url)
+        checkpoints = fetch_comfy_checkpoints(node.url) if stats is not None else None
+        with self._lock:
+            node.probed = True
+            node.probed_at = time.time()
+            if stats is None:
+                self._mark_unhealthy(node, "system_stats unreachable")
+                return False
+            node.stats = stats
+            if checkpoints is not None:
+                node.checkpoints = checkpoints
+            node.healthy = True
+            node.failures = 0
+            node.last_error = ""
+            return True
+
+    def probe_all(self) -> None:
+        if len(self.nodes) == 1:
+            self.probe(self.nodes[0])
+            return
+        with ThreadPoolExecutor(max_workers=len(self.nodes), thread_name_prefix="comfy-probe") as executor:
+            list(executor.map(self.probe, self.nodes))
+
+    def start_prober(self, interval_seconds: float) -> None:
+        with self._lock:
+            if self._prober is not None:
+                return
+            self._prober = threading.Thread(
+                target=self._probe_loop, args=(interval_seconds,), name="comfy-prober", daemon=True
+            )
+        self._prober.start()
+
+    def stop_prober(self) -> None:
+        self._prober_stop.set()
+
+    def _probe_loop(self, interval_seconds: float) -> None:
+        while not self._prober_stop.is_set():
+            try:
+                self.probe_all()
+            except Exception as err:
+                print(f"[render-server] comfy probe failed: {err}")
+            self._prober_stop.wait(interval_seconds)
+
+    def available_nodes(self) -> list[ComfyNode]:
+        now = time.time()
+        background = self._prober is not None
+        for node in self.nodes:
+            if not node.probed or (not background and not node.healthy and now >= node.retry_at):
+                self.probe(node)
+            if node.healthy and self.first_reachable_only:
+                break
+        healthy = [node for node in self.nodes if node.healthy]
+        return healthy[:1] if self.first_reachable_only else healthy
+
+    def get_node(self, url: str) -> ComfyNode | None:
+        url = normalize_url(url)
+        return next((node for node in self.nodes if node.url == url), None)
+
+    def primary_node(self) -> ComfyNode | None:
+        nodes = self.available_nodes()
+        return nodes[0] if nodes else None
+
+    def acquire(self, exclude: set[str] | None = None, models: str | None = None) -> ComfyNode | None:
+        """Pick the least-queued node, preferring one that last ran `models` (see describe_model_set).
+
+        A node that already has the checkpoint/LoRA set loaded wins unless its queue is more than
+        COMFYUI_AFFINITY_MAX_QUEUE_GAP prompts longer than the least-queued node's.
+        """
+        exclude = exclude or set()
+        candidates = [node for node in self.available_nodes() if node.url not in exclude]
+        if not candidates:
+            return None
+        if len(candidates) > 1:
+            now = time.time()
+            for node in candidates:
+                if now - node.queue_checked_at >= self.QUEUE_DEPTH_TTL_SECONDS:
+                    self.refresh_queue_depth(node)
+            candidates = [node for node in candidates if node.healthy] or candidates
+        with self._lock:
+
+            def load(node: ComfyNode) -> tuple[int, int]:
+                return node.queue_depth + node.dispatched_since_check, node.inflight
+
+            best = min(candidates, key=load)
+            if models:
+                warm = [node for node in candidates if node.loaded_models == models]
+                if warm:
+                    best_warm = min(warm, key=load)
+                    if load(best_warm)[0] - load(best)[0] <= self.affinity_max_queue_gap:
+                        best = best_warm
+            best.inflight += 1
+            best.dispatched_since_check += 1
+            return best
+
+    def release(self, node: ComfyNode) -> None:
+        with self._lock:
+            node.inflight = max(0, node.inflight - 1)
+
+    def record_loaded_models(self, node: ComfyNode, models: str | None) -> None:
+        """Remember what a finished prompt left loaded on `node`; None when that is unknown."""
+        with self._lock:
+            node.loaded_models = models
+
+    def refresh_queue_depth(self, node: ComfyNode) -> None:
+        try:
+            queue = comfy_get_json(node.url, "/queue", timeout=3)
+        except Exception as err:
+            self.mark_failed(node, err)
+            return
+        with self._lock:
+            node.queue_depth = len(queue.get("queue_running") or []) + len(queue.get("queue_pending") or [])
+            node.queue_checked_at = time.time()
+            node.dispatched_since_check = 0
+
+    def mark_failed(self, node: ComfyNode, err: Exception | str) -> None:
+        with self._lock:
+            self._mark_unhealthy(node, str(err))
+
+    def reference_upload_lock(self, node: ComfyNode, sha256: str) -> threading.Lock:
+        with self._lock:
+            return self._upload_locks.setdefault((node.url, sha256), threading.Lock())
+
+    def uploaded_reference(self, node: ComfyNode, sha256: str) -> str | None:
+        with self._lock:
+            return node.uploaded_references.get(sha256)
+
+    def record_reference_upload(self, node: ComfyNode, sha256: str, comfy_name: str) -> None:
+        with self._lock:
+            node.uploaded_references[sha256] = comfy_name
+
+    def _mark_unhealthy(self, node: ComfyNode, reason: str) -> None:
+        # A node that went away may come back with a fresh input directory.
+        node.uploaded_references.clear()
+        node.loaded_models = None
+        node.healthy = False
+        node.failures += 1
+        node.last_error = reason[:300]
+        node.retry_at = time.time() + min(60.0, self.retry_base_seconds * (2 ** min(node.failures - 1, 4)))
+
+    def is_node_failure(self, node: ComfyNode, err: Exception) -> bool:
+        if isinstance(err, (requests.ConnectionError, requests.Timeout)):
+            return True
+        if isinstance(err, TimeoutError):
+            # A prompt that never finished only counts against the node if the node itself stopped answering.
+            return get_comfy_system_stats(node.url) is None
+        return False
+
+    def describe(self) -> list[dict[str, Any]]:
+        return [node.describe() for node in self.nodes]
+
+
+_comfy_pool: ComfyNodePool | None = None
+_comfy_pool_lock = threading.Lock()
+
+
+def get_comfy_pool() -> ComfyNodePool:
+    global _comfy_pool
+    with _comfy_pool_lock:
+        if _comfy_pool is None:
+            pool_urls = get_comfyui_pool_urls()
+            if pool_urls:
+                _comfy_pool = ComfyNodePool(pool_urls)
+            else:
+                _comfy_pool = ComfyNodePool(get_comfyui_candidate_urls(), first_reachable_only=True)
+        return _comfy_pool
+
+
+METRIC_DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0, 600.0)
+
+
+def escape_metric_label(value: Any) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+class MetricsRegistry:
+    """Counters, gauges and histograms rendered in the Prometheus text exposition format.
+
+    Series are created on first use, keyed by metric name and label values. Kept in-process
+    so /metrics needs no client library.
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._metrics: dict[str, dict[str, Any]] = {}
+
+    def describe(self, name: str, kind: str, help_text: str, buckets: tuple[float, ...] = METRIC_DURATION_BUCKETS) -> None:
+        with self._lock:
+            self._metrics.setdefault(name, {"kind": kind, "help": help_text, "buckets": buckets, "series": {}})
+
+    def inc(self, name: str, amount: float = 1.0, **labels: str) -> None:
+        with self._lock:
+            series = self._metrics[name]["series"]
+            key = tuple(sorted(labels.items()))
+            series[key] = series.get(key, 0.0) + amount
+
+    def set(self, name: str, value: float, **labels: str) -> None:
+        with self._lock:
+            self._metrics[name]["series"][tuple(sorted(labels.items()))] = float(value)
+
+    def observe(self, name: str, value: float, **labels: str) -> None:
+        with self._lock:
+            metric = self._metrics[name]
+            key = tuple(sorted(labels.items()))
+            histogram = metric["series"].get(key)
+            if histogram is None:
+                histogram = metric["series"][key] = {"counts": [0] * len(metric["buckets"]), "sum": 0.0, "count": 0}
+            for position, bound in enumerate(metric["buckets"]):
+                if value <= bound:
+                    histogram["counts"][position] += 1
+            histogram["sum"] += value
+            histogram["count"] += 1
+
+    def render(self) -> str:
+        def format_labels(labels: tuple[tuple[str, str], ...], extra: tuple[tuple[str, str], ...] = ()) -> str:
+            pairs = [f'{key}="{escape_metric_label(value)}"' for key, value in labels + extra]
+            return "{" + ",".join(pairs) + "}" if pairs else ""
+
+        lines: list[str] = []
+        with self._lock:
+            for name, metric in self._metrics.items():
+                lines.append(f"# HELP {name} {metric['help']}")
+                lines.append(f"# TYPE {name} {metric['kind']}")
+                for labels, value in metric["series"].items():
+                    if metric["kind"] != "histogram":
+                        lines.append(f"{name}{format_labels(labels)} {value:g}")
+                        continue
+                    for bound, count in zip(metric["buckets"], value["counts"]):
+                        lines.append(f"{name}_bucket{format_labels(labels, (('le', f'{bound:g}'),))} {count}")
+                    lines.append(f"{name}_bucket{format_labels(labels, (('le', '+Inf'),))} {value['count']}")
+                    lines.append(f"{name}_sum{format_labels(labels)} {value['sum']:.6f}")
+                    lines.append(f"{name}_count{format_labels(labels)} {value['count']}")
+        return "\n".join(lines) + "\n"
+
+
+_metrics: MetricsRegistry | None = None
+_metrics_lock = threading.Lock()
+
+
+def get_metrics() -> MetricsRegistry:
+    global _metrics
+    with _metrics_lock:
+        if _metrics is None:
+            _metrics = MetricsRegistry()
+            _metrics.describe(
+                "studioai_render_stage_duration_seconds",
+                "histogram",
+                "Time spent in each render stage, by ComfyUI node where the stage runs on one.",
+            )
+            _metrics.describe("studioai_render_shots_total", "counter", "Shots finished, by ComfyUI node and outcome.")
+            _metrics.describe("studioai_render_fallback_frames_total", "counter", "Shots replaced by a fallback frame.")
+            _metrics.describe(
+                "studioai_render_hedged_shots_total",
+                "counter",
+                "Shots that overran their predicted deadline and were hedged, by original node and winning attempt.",
+            )
+            _metrics.describe("studioai_render_callback_duration_seconds", "histogram", "Webhook delivery time, by callback route.")
+            _metrics.describe("studioai_render_callback_failures_total", "counter", "Failed webhook delivery attempts, by callback route.")
+            _metrics.describe("studioai_render_jobs_total", "counter", "Render jobs finished, by status.")
+            _metrics.describe(
+                "studioai_render_jobs_coalesced_total", "counter", "Submissions attached to an identical in-flight job."
+            )
+            _metrics.describe("studioai_render_jobs_in_flight", "gauge", "Render jobs currently running.")
+            _metrics.describe("studioai_render_jobs_pending", "gauge", "Render jobs waiting in the scheduler queue.")
+            _metrics.describe("studioai_render_node_prompts_in_flight", "gauge", "Shot prompts this server has in flight, by ComfyUI node.")
+            _metrics.describe("studioai_render_node_queue_depth", "gauge", "Last observed ComfyUI queue depth, by node.")
+            _metrics.describe("studioai_render_node_healthy", "gauge", "1 if the ComfyUI node passed its last probe, by node.")
+        return _metrics
+
+
+class JobTimings:
+    """Per-job record of the stages measured with measure_stage.
+
+    Stage totals are reported in /complete metadata; the individual spans are kept for the
+    Chrome trace served by GET /jobs/{job_id}/trace (kept on the job's RenderJob).
+    """
+
+    MAX_SPANS = 20000
+
+    def __init__(self, job_id: str = "", episode_id: str = "") -> None:
+        self.job_id = job_id
+        self.episode_id = episode_id
+        self.started_at = time.time()
+        self._lock = threading.Lock()
+        self._stages: dict[str, dict[str, float]] = {}
+        self._spans: list[dict[str, Any]] = []
+        self._dropped_spans = 0
+
+    def add(
+        self,
+        stage: str,
+        seconds: float,
+        started_at: float | None = None,
+        node: str | None = None,
+        shot: int | None = None,
+        detail: dict[str, Any] | None = None,
+    ) -> None:
+        with self._lock:
+            totals = self._stages.setdefault(stage, {"seconds": 0.0, "count": 0, "max_seconds": 0.0})
+            totals["seconds"] += seconds
+            totals["count"] += 1
+            totals["max_seconds"] = max(totals["max_seconds"], seconds)
+            if started_at is None:
+                return
+            if len(self._spans) >= self.MAX_SPANS:
+                self._dropped_spans += 1
+                return
+            args: dict[str, Any] = dict(detail or {})
+            if node:
+                args["node"] = node
+            if shot is not None:
+                args["shot"] = shot + 1
+            self._spans.append(
+                {
+                    "name": stage,
+                    "started_at": started_at,
+                    "seconds": seconds,
+                    "thread": threading.current_thread().name,
+                    "args": args,
+                }
+            )
+
+    def summary(self) -> dict[str, Any]:
+        with self._lock:
+            stages = {
+                stage: {
+                    "seconds": round(totals["seconds"], 3),
+                    "count": int(totals["count"]),
+                    "max_seconds": round(totals["max_seconds"], 3),
+                }
+                for stage, totals in sorted(self._stages.items())
+            }
+        # Stages overlap (shots run in parallel, segments encode while shots render), so they can sum past wall_seconds.
+        return {"wall_seconds": round(time.time() - self.started_at, 3), "stages": stages}
+
+    def trace_events(self) -> dict[str, Any]:
+        """Chrome trace-event JSON (chrome://tracing, Perfetto): one lane per worker thread."""
+        with self._lock:
+            spans = list(self._spans)
+            dropped = self._dropped_spans
+        threads: dict[str, int] = {}
+        events: list[dict[str, Any]] = [
+            {"name": "process_name", "ph": "M", "pid": 1, "tid": 0, "args": {"name": f"job {self.job_id} ({self.episode_id})"}}
+        ]
+        for span in sorted(spans, key=lambda item: item["started_at"]):
+            tid = threads.setdefault(span["thread"], len(threads) + 1)
+            events.append(
+                {
+                    "name": span["name"],
+                    "cat": "render",
+                    "ph": "X",
+                    "pid": 1,
+                    "tid": tid,
+                    "ts": round((span["started_at"] - self.started_at) * 1_000_000),
+                    "dur": max(1, round(span["seconds"] * 1_000_000)),
+                    "args": span["args"],
+                }
+            )
+        events.extend(
+            {"name": "thread_name", "ph": "M", "pid": 1, "tid": tid, "args": {"name": name}} for name, tid in threads.items()
+        )
+        return {
+            "traceEvents": events,
+            "displayTimeUnit": "ms",
+            "otherData": {
+                "job_id": self.job_id,
+                "episode_id": self.episode_id,
+                "started_at": self.started_at,
+                "dropped_spans": dropped,
+            },
+        }
+
+
+# Set by run_render_pipeline; shot and segment workers inherit it through contextvars.copy_context().
+_current_job_timings: contextvars.ContextVar[JobTimings | None] = contextvars.ContextVar("render_job_timings", default=None)
+
+
+@contextmanager
+def measure_stage(stage: str, node: str | None = None, shot: int | None = None) -> Iterator[None]:
+    started_at = time.time()
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - started
+        get_metrics().observe("studioai_render_stage_duration_seconds", elapsed, stage=stage, node=node or "")
+        timings = _current_job_timings.get()
+        if timings is not None:
+            timings.add(stage, elapsed, started_at=started_at, node=node, shot=shot)
+
+
+TERMINAL_CALLBACK_ROUTES = {"/complete", "/failed"}
+
+
+class CallbackDispatcher:
+    """Outbound webhook queue so the render loop never waits on the API.
+
+    Successive /progress updates for a job are coalesced into the latest payload. Terminal
+    callbacks (/complete, /failed) are retried with exponential backoff and, when a spool
+    directory is configured, written to disk until delivered so they survive a restart.
+
+    Up to `workers` callbacks are delivered at once, but at most one per job and callback URL,
+    so different jobs deliver in parallel while each job's callbacks still arrive in order.
+    """
+
+    def __init__(self, spool_dir: Path | None, max_attempts: int, retry_base_seconds: float, workers: int = 4) -> None:
+        self.spool_dir = spool_dir
+        self.max_attempts = max_attempts
+        self.retry_base_seconds = retry_base_seconds
+        self.workers = workers
+        self._cond = threading.Condition()
+        self._order: deque[str] = deque()
+        self._items: dict[str, dict[str, Any]] = {}
+        self._sending = 0
+        self._busy_streams: set[str] = set()
+        self._threads: list[threading.Thread] = []
+        # Timing breakdown of the job that queued each callback, keyed by item id (never spooled).
+        self._job_timings: dict[str, JobTimings] = {}
+
+    def enqueue(self, base_url: str, callback_key: str, route: str, payload: dict[str, Any]) -> None:
+        route = "/" + route.lstrip("/")
+        item = {
+            "id": uuid.uuid4().hex,
+            "url": f"{base_url.rstrip('/')}{route}",
+            "callback_key": callback_key,
+            "route": route,
+            "payload": payload,
+            "attempts": 0,
+            "next_attempt_at": 0.0,
+            "enqueued_at": time.time(),
+        }
+        timings = _current_job_timings.get()
+        if route in TERMINAL_CALLBACK_ROUTES:
+            # Disk IO stays outside the lock so the render loop never waits on it.
+            self._spool(item)
+        with self._cond:
+            if route in TERMINAL_CALLBACK_ROUTES:
+                key = f"terminal:{item['id']}"
+            else:
+                key = f"progress:{item['url']}:{payload.get('job_id')}"
+                pending = self._items.get(key)
+                if pending is not None:
+                    # Keep the queue position, send only the newest state.
+                    pending["payload"] = payload
+                    pending["enqueued_at"] = item["enqueued_at"]
+                    return
+            self._items[key] = item
+            self._order.append(key)
+            if timings is not None:
+                self._job_timings[item["id"]] = timings
+            self._ensure_worker_locked()
+            self._cond.notify()
+
+    def restore_spool(self) -> int:
+        if not self.spool_dir or not self.spool_dir.exists():
+            return 0
+        items: list[dict[str, Any]] = []
+        for spool_file in sorted(self.spool_dir.glob("*.json"), key=lambda p: p.stat().st_mtime):
+            try:
+                items.append(json.loads(spool_file.read_text(encoding="utf-8")))
+            except (OSError, ValueError):
+                continue
+        restored = 0
+        with self._cond:
+            for item in items:
+                key = f"terminal:{item.get('id')}"
+                if key in self._items:
+                    continue
+                item["next_attempt_at"] = 0.0
+                self._items[key] = item
+                self._order.append(key)
+                restored += 1
+            if restored:
+                self._ensure_worker_locked()
+                self._cond.notify()
+        return restored
+
+    def flush(self, timeout_seconds: float) -> bool:
+        deadline = time.time() + timeout_seconds
+        with self._cond:
+            while self._order or self._sending:
+                remaining = deadline - time.time()
+                if remaining <= 0:
+                    return False
+                self._cond.wait(min(remaining, 0.2))
+        return True
+
+    def stats(self) -> dict[str, Any]:
+        with self._cond:
+            return {
+                "pending": len(self._order),
+                "terminal_pending": sum(1 for key in self._order if key.startswith("terminal:")),
+            }
+
+    def _ensure_worker_locked(self) -> None:
+        self._threads = [thread for thread in self._threads if thread.is_alive()]
+        while len(self._threads) < self.workers:
+            thread = threading.Thread(target=self._work, name=f"callback-dispatcher-{len(self._threads)}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def _spool(self, item: dict[str, Any]) -> None:
+        if not self.spool_dir:
+            return
+        try:
+            self.spool_dir.mkdir(parents=True, exist_ok=True)
+            tmp_path = self.spool_dir / f"{item['id']}.tmp"
+            tmp_path.write_text(json.dumps(item), encoding="utf-8")
+            os.replace(tmp_path, self.spool_dir / f"{item['id']}.json")
+        except OSError as err:
+            print(f"[render-server] callback spool write failed {item['route']}: {err}")
+
+    def _unspool(self, item: dict[str, Any]) -> None:
+        if self.spool_dir:
+            (self.spool_dir / f"{item['id']}.json").unlink(missing_ok=True)
+
+    def _next_ready_locked(self) -> tuple[str | None, float]:
+        now = time.time()
+        next_wake = 1.0
+        for key in self._order:
+            if callback_stream(self._items[key]) in self._busy_streams:
+                continue
+            wait_for = self._items[key]["next_attempt_at"] - now
+            if wait_for <= 0:
+                return key, 0.0
+            next_wake = min(next_wake, wait_for)
+        return None, next_wake
+
+    def _work(self) -> None:
+        while True:
+            with self._cond:
+                key, wait_for = self._next_ready_locked()
+                while key is None:
+                    self._cond.wait(wait_for)
+                    key, wait_for = self._next_ready_locked()
+                self._order.remove(key)
+                item = self._items.pop(key)
+                stream = callback_stream(item)
+                self._busy_streams.add(stream)
+                self._sending += 1
+            try:
+                self._deliver(key, item)
+            finally:
+                with self._cond:
+                    self._busy_streams.discard(stream)
+                    self._sending -= 1
+                    self._cond.notify_all()
+
+    def _deliver(self, key: str, item: dict[str, Any]) -> None:
+        headers = {
+            "x-render-server-key": item["callback_key"],
+            "x-render-enqueued-at": f"{float(item.get('enqueued_at') or 0.0):.6f}",
+            "Content-Type": "application/json",
+        }
+        retryable = True
+        started = time.perf_counter()
+        try:
+            response = get_http_session("callback").post(
+                item["url"], json=item["payload"], headers=headers, timeout=get_http_timeout("callback")
+            )
+            if response.status_code < 400:
+                self._record_attempt(item, started, failed=False)
+                self._unspool(item)
+                self._forget_timings(item)
+                return
+            error = f"HTTP {response.status_code}"
+            retryable = response.status_code >= 500 or response.status_code in {408, 429}
+        except Exception as err:
+            error = str(err)
+
+        self._record_attempt(item, started, failed=True)
+        item["attempts"] += 1
+        if not key.startswith("terminal:") or not retryable or item["attempts"] >= self.max_attempts:
+            print(f"[render-server] callback failed {item['route']} after {item['attempts']} attempt(s): {error}")
+            self._unspool(item)
+            self._forget_timings(item)
+            return
+        delay = min(300.0, self.retry_base_seconds * (2 ** (item["attempts"] - 1)))
+        item["next_attempt_at"] = time.time() + delay
+        self._spool(item)
+        with self._cond:
+            self._items[key] = item
+            self._order.append(key)
+
+    def _record_attempt(self, item: dict[str, Any], started: float, failed: bool) -> None:
+        elapsed = time.perf_counter() - started
+        started_at = time.time() - elapsed
+        metrics = get_metrics()
+        metrics.observe("studioai_render_callback_duration_seconds", elapsed, route=item["route"])
+        if failed:
+            metrics.inc("studioai_render_callback_failures_total", route=item["route"])
+        with self._cond:
+            timings = self._job_timings.get(item["id"])
+        if timings is not None:
+            detail = {"route": item["route"], "attempt": item["attempts"] + 1, "failed": failed}
+            if item["payload"].get("current_step"):
+                detail["step"] = item["payload"]["current_step"]
+            timings.add("callback", elapsed, started_at=started_at, detail=detail)
+
+    def _forget_timings(self, item: dict[str, Any]) -> None:
+        with self._cond:
+            self._job_timings.pop(item["id"], None)
+
+
+def callback_stream(item: dict[str, Any]) -> str:
+    """Callbacks sharing a stream are delivered one at a time: the same job on the same receiver."""
+    base_url = item["url"][: -len(item["route"])] if item["url"].endswith(item["route"]) else item["url"]
+    return f"{base_url}#{item['payload'].get('job_id', '')}"
+
+
+_callback_dispatcher: CallbackDispatcher | None = None
+_callback_dispatcher_lock = threading.Lock()
+
+
+def get_callback_dispatcher() -> CallbackDispatcher:
+    global _callback_dispatcher
+    with _callback_dispatcher_lock:
+        if _callback_dispatcher is None:
+            spool_dir = (os.getenv("RENDER_CALLBACK_SPOOL_DIR") or "").strip()
+            _callback_dispatcher = CallbackDispatcher(
+                spool_dir=Path(spool_dir) if spool_dir else None,
+                max_attempts=max(1, parse_int(os.getenv("RENDER_CALLBACK_MAX_ATTEMPTS", 6), 6)),
+                retry_base_seconds=max(0.1, parse_float(os.getenv("RENDER_CALLBACK_RETRY_BASE_SECONDS", 2), 2.0)),
+                workers=max(1, parse_int(os.getenv("RENDER_CALLBACK_WORKERS", 4), 4)),
+            )
+        return _callback_dispatcher
+
+
+def send_callback(base_url: str, callback_key: str, route: str, payload: dict[str, Any]) -> None:
+    dispatcher = get_callback_dispatcher()
+    registry = get_job_registry()
+    job = registry.get(str(payload.get("job_id") or ""))
+    if job is None or not job.detached_render:
+        # A job whose submitter cancelled it has already been told; it only renders for its duplicates.
+        dispatcher.enqueue(base_url, callback_key, route, payload)
+    # Submissions coalesced into this job get the same callback under their own job_id.
+    for attached in registry.observe_callback("/" + route.lstrip("/"), payload):
+        if attached.request is not None:
+            dispatcher.enqueue(
+                attached.request.callback_url,
+                attached.request.callback_key,
+                route,
+                {**payload, "job_id": attached.request.job_id, "coalesced_with": payload.get("job_id")},
+            )
 
 
 def slugify(value: str) -> str:
@@ -226,17 +1063,6 @@ def pick_primary_character(characters: list[CharacterPayload]) -> CharacterPaylo
     return characters[0]
 
 
-def get_focus_character(
-    shot: ShotPayload, characters: list[CharacterPayload], fallback: CharacterPayload | None
-) -> CharacterPayload | None:
-    target = (shot.focus_character or "").strip().lower()
-    if target:
-        for character in characters:
-            if character.name.lower() == target:
-                return character
-    return fallback
-
-
 def normalize_emotion(value: str) -> str:
     v = (value or "").strip().lower()
     if not v:
@@ -258,27 +1084,46 @@ def normalize_emotion(value: str) -> str:
     return v
 
 
-def pick_emotion_reference(
-    focus_character: CharacterPayload | None,
-    shot: ShotPayload,
-) -> tuple[str | None, str]:
-    if not focus_character:
-        return None, ""
-    refs = focus_character.emotion_references or []
-    if not refs:
-        return focus_character.reference_image_url, ""
-
-    desired = normalize_emotion(shot.emotion)
-    for ref in refs:
-        if normalize_emotion(ref.emotion) == desired and ref.reference_image_url:
-            return ref.reference_image_url, (ref.prompt_hint or "")
-    for ref in refs:
-        if normalize_emotion(ref.emotion) == "neutral" and ref.reference_image_url:
-            return ref.reference_image_url, (ref.prompt_hint or "")
-    for ref in refs:
-        if ref.reference_image_url:
-            return ref.reference_image_url, (ref.prompt_hint or "")
-    return focus_character.reference_image_url, ""
+class CharacterIndex:
+    """A request's characters indexed once: by name, and each one's emotion references by emotion.
+
+    Names match case-insensitively and the first character with a name wins. A missing
+    emotion falls back to the character's neutral reference, then its first one, then its
+    main reference image.
+    """
+
+    def __init__(self, characters: list[CharacterPayload]) -> None:
+        self.primary = pick_primary_character(characters)
+        self._by_name: dict[str, CharacterPayload] = {}
+        self._references: dict[int, tuple[dict[str, EmotionReferencePayload], EmotionReferencePayload | None]] = {}
+        for character in characters:
+            self._by_name.setdefault(character.name.lower(), character)
+            refs = character.emotion_references or []
+            if not refs:
+                continue
+            by_emotion: dict[str, EmotionReferencePayload] = {}
+            for ref in refs:
+                if ref.reference_image_url:
+                    by_emotion.setdefault(normalize_emotion(ref.emotion), ref)
+            first = next((ref for ref in refs if ref.reference_image_url), None)
+            self._references[id(character)] = (by_emotion, first)
+
+    def focus_character(self, shot: ShotPayload) -> CharacterPayload | None:
+        target = (shot.focus_character or "").strip().lower()
+        return self._by_name.get(target, self.primary) if target else self.primary
+
+    def emotion_reference(self, character: CharacterPayload | None, shot: ShotPayload) -> tuple[str | None, str]:
+        """Reference image URL and prompt hint for `character` showing the shot's emotion."""
+        if not character:
+            return None, ""
+        indexed = self._references.get(id(character))
+        if indexed is None:
+            return character.reference_image_url, ""
+        by_emotion, first = indexed
+        ref = by_emotion.get(normalize_emotion(shot.emotion)) or by_emotion.get("neutral") or first
+        if ref is None:
+            return character.reference_image_url, ""
+        return ref.reference_image_url, (ref.prompt_hint or "")
 
 
 def build_shot_prompt(
@@ -327,27 +1172,136 @@ def build_shot_prompt(
     return positive, negative, int(shot_seed), reference_url
 
 
-def fetch_default_checkpoint(comfyui_url: str) -> str | None:
+def fetch_default_checkpoint(comfyui_url: str, checkpoints: list[str] | None = None) -> str | None:
     forced = (os.getenv("COMFYUI_CHECKPOINT") or "").strip()
     if forced:
         return forced
-    try:
-        info = comfy_get_json(comfyui_url, "/object_info/CheckpointLoaderSimple", timeout=10)
-        values = (((info.get("CheckpointLoaderSimple") or {}).get("input") or {}).get("required") or {}).get("ckpt_name") or []
-        if values and isinstance(values[0], list) and values[0]:
-            return str(values[0][0])
-    except Exception:
-        return None
-    return None
+    if checkpoints is None:
+        checkpoints = fetch_comfy_checkpoints(comfyui_url)
+    return checkpoints[0] if checkpoints else None
+
+
+class CompiledWorkflow:
+    """A ComfyUI API graph indexed once so per-shot prompts are cheap overlays.
+
+    The class-type index and the patch points (text encoders, samplers, latents, outputs,
+    reference loaders) are computed up front. instantiate() shallow-copies the graph and
+    replaces only the nodes it patches, leaving every other node shared with the template.
+    """
+
+    def __init__(self, graph: dict[str, Any]) -> None:
+        self.graph = graph
+        self.nodes_by_class: dict[str, list[str]] = {}
+        for node_id, node in graph.items():
+            if isinstance(node, dict) and node.get("class_type"):
+                self.nodes_by_class.setdefault(str(node["class_type"]), []).append(node_id)
+        self.text_node_ids = self.nodes_by_class.get("CLIPTextEncode", [])[:2]
+        self.sampler_ids = self.nodes_by_class.get("KSampler", [])
+        self.latent_ids = self.nodes_by_class.get("EmptyLatentImage", [])
+        self.save_ids = self.nodes_by_class.get("SaveImage", [])
+        self.load_image_ids = self.nodes_by_class.get("LoadImage", [])
+        self.checkpoint_ids = self.nodes_by_class.get("CheckpointLoaderSimple", [])
+        # The first LoRA loader is the character LoRA slot (CharacterPayload.lora_file).
+        self.lora_ids = self.nodes_by_class.get("LoraLoader", []) + self.nodes_by_class.get("LoraLoaderModelOnly", [])
+        # Popular IPAdapter custom nodes take the reference image and a strength weight.
+        self.ipadapter_ids = [
+            node_id
+            for class_type, node_ids in self.nodes_by_class.items()
+            if "IPAdapter" in class_type
+            for node_id in node_ids
+        ]
+        # img2img samplers start from an encoded image; multiple takes repeat that latent.
+        self.encoded_latent_links: list[tuple[str, list[Any]]] = []
+        for node_id in self.sampler_ids:
+            link = (graph[node_id].get("inputs") or {}).get("latent_image")
+            if isinstance(link, list) and (graph.get(str(link[0])) or {}).get("class_type") in {"VAEEncode", "VAEEncodeForInpaint"}:
+                self.encoded_latent_links.append((node_id, link))
+        self.next_node_id = max((int(node_id) for node_id in graph if str(node_id).isdigit()), default=0) + 1
+
+    def instantiate(
+        self,
+        positive_prompt: str,
+        negative_prompt: str,
+        seed: int,
+        prefix: str,
+        config: dict[str, Any],
+        comfy_input_image: str | None = None,
+        batch_size: int = 1,
+        lora_name: str | None = None,
+    ) -> dict[str, Any]:
+        workflow = dict(self.graph)
+
+        def overlay(node_id: str) -> dict[str, Any]:
+            node = dict(workflow[node_id])
+            node["inputs"] = dict(node.get("inputs") or {})
+            workflow[node_id] = node
+            return node["inputs"]
+
+        for node_id, text in zip(self.text_node_ids, (positive_prompt, negative_prompt)):
+            overlay(node_id)["text"] = text
+        for node_id in self.sampler_ids:
+            inputs = overlay(node_id)
+            inputs["seed"] = int(seed)
+            inputs["steps"] = int(config["steps"])
+            inputs["cfg"] = float(config["cfg"])
+            inputs["sampler_name"] = config["sampler"]
+            inputs["scheduler"] = config["scheduler"]
+            if "denoise" in inputs:
+                inputs["denoise"] = float(config["denoise"])
+        for node_id in self.latent_ids:
+            inputs = overlay(node_id)
+            inputs["width"] = int(config["width"])
+            inputs["height"] = int(config["height"])
+            inputs["batch_size"] = batch_size
+        if batch_size > 1:
+            for offset, (node_id, link) in enumerate(self.encoded_latent_links):
+                repeat_id = str(self.next_node_id + offset)
+                workflow[repeat_id] = {
+                    "class_type": "RepeatLatentBatch",
+                    "inputs": {"samples": list(link), "amount": batch_size},
+                }
+                overlay(node_id)["latent_image"] = [repeat_id, 0]
+        for node_id in self.save_ids:
+            overlay(node_id)["filename_prefix"] = prefix
+        if lora_name and self.lora_ids:
+            overlay(self.lora_ids[0])["lora_name"] = lora_name
+        if comfy_input_image:
+            for node_id in self.load_image_ids:
+                overlay(node_id)["image"] = comfy_input_image
+            for node_id in self.ipadapter_ids:
+                inputs = overlay(node_id)
+                if "weight" in inputs:
+                    inputs["weight"] = float(config["reference_strength"])
+                if "image" in inputs:
+                    inputs["image"] = comfy_input_image
+        return workflow
 
+    def model_set(self, lora_name: str | None = None) -> tuple[list[str], list[str]]:
+        checkpoints = [str((self.graph[node_id].get("inputs") or {}).get("ckpt_name", "")) for node_id in self.checkpoint_ids]
+        loras = [str((self.graph[node_id].get("inputs") or {}).get("lora_name", "")) for node_id in self.lora_ids]
+        if lora_name and loras:
+            loras[0] = lora_name
+        return checkpoints, loras
 
-def load_workflow_template() -> dict[str, Any] | None:
+
+_workflow_template_cache: dict[str, tuple[tuple[int, int], CompiledWorkflow]] = {}
+_workflow_template_lock = threading.Lock()
+
+
+def load_workflow_template() -> CompiledWorkflow | None:
     path = (os.getenv("COMFYUI_WORKFLOW_PATH") or "").strip()
     if not path:
         return None
     workflow_path = Path(path)
     if not workflow_path.exists() or workflow_path.suffix.lower() != ".json":
         raise RuntimeError(f"COMFYUI_WORKFLOW_PATH not found or not JSON: {workflow_path}")
+    stat = workflow_path.stat()
+    signature = (stat.st_mtime_ns, stat.st_size)
+    with _workflow_template_lock:
+        cached = _workflow_template_cache.get(path)
+        if cached and cached[0] == signature:
+            return cached[1]
+
     loaded = json.loads(workflow_path.read_text(encoding="utf-8"))
     if isinstance(loaded, dict) and isinstance(loaded.get("prompt"), dict):
         loaded = loaded["prompt"]
@@ -356,72 +1310,10 @@ def load_workflow_template() -> dict[str, Any] | None:
     has_nodes = any(isinstance(node, dict) and node.get("class_type") for node in loaded.values())
     if not has_nodes:
         raise RuntimeError("COMFYUI_WORKFLOW_PATH does not look like a ComfyUI API workflow.")
-    return loaded
-
-
-def find_nodes_by_class(workflow: dict[str, Any], class_type: str) -> list[tuple[str, dict[str, Any]]]:
-    result: list[tuple[str, dict[str, Any]]] = []
-    for node_id, node in workflow.items():
-        if isinstance(node, dict) and node.get("class_type") == class_type:
-            result.append((node_id, node))
-    return result
-
-
-def patch_workflow_text_nodes(workflow: dict[str, Any], positive_prompt: str, negative_prompt: str) -> None:
-    text_nodes = find_nodes_by_class(workflow, "CLIPTextEncode")
-    if not text_nodes:
-        return
-    text_nodes[0][1].setdefault("inputs", {})["text"] = positive_prompt
-    if len(text_nodes) > 1:
-        text_nodes[1][1].setdefault("inputs", {})["text"] = negative_prompt
-
-
-def patch_workflow_common(
-    workflow: dict[str, Any],
-    positive_prompt: str,
-    negative_prompt: str,
-    seed: int,
-    prefix: str,
-    config: dict[str, Any],
-) -> None:
-    patch_workflow_text_nodes(workflow, positive_prompt, negative_prompt)
-
-    for _, node in find_nodes_by_class(workflow, "KSampler"):
-        inputs = node.setdefault("inputs", {})
-        inputs["seed"] = int(seed)
-        inputs["steps"] = int(config["steps"])
-        inputs["cfg"] = float(config["cfg"])
-        inputs["sampler_name"] = config["sampler"]
-        inputs["scheduler"] = config["scheduler"]
-        if "denoise" in inputs:
-            inputs["denoise"] = float(config["denoise"])
-
-    for _, node in find_nodes_by_class(workflow, "EmptyLatentImage"):
-        inputs = node.setdefault("inputs", {})
-        inputs["width"] = int(config["width"])
-        inputs["height"] = int(config["height"])
-        inputs["batch_size"] = 1
-
-    for _, node in find_nodes_by_class(workflow, "SaveImage"):
-        node.setdefault("inputs", {})["filename_prefix"] = prefix
-
-
-def patch_workflow_reference_image(workflow: dict[str, Any], comfy_input_name: str, config: dict[str, Any]) -> None:
-    for _, node in find_nodes_by_class(workflow, "LoadImage"):
-        node.setdefault("inputs", {})["image"] = comfy_input_name
-
-    # Handle popular IPAdapter custom nodes when present in workflow templates.
-    for _, node in workflow.items():
-        if not isinstance(node, dict):
-            continue
-        class_type = str(node.get("class_type", ""))
-        if "IPAdapter" not in class_type:
-            continue
-        inputs = node.setdefault("inputs", {})
-        if "weight" in inputs:
-            inputs["weight"] = float(config["reference_strength"])
-        if "image" in inputs:
-            inputs["image"] = comfy_input_name
+    compiled = CompiledWorkflow(loaded)
+    with _workflow_template_lock:
+        _workflow_template_cache[path] = (signature, compiled)
+    return compiled
 
 
 def build_builtin_workflow_text2img(checkpoint: str, prefix: str, config: dict[str, Any]) -> dict[str, Any]:
@@ -482,22 +1374,121 @@ def build_builtin_workflow_img2img(
     }
 
 
-def download_reference_image(url: str, output_dir: Path) -> Path:
-    response = requests.get(url, timeout=30)
-    response.raise_for_status()
-    parsed = urlparse(url)
-    ext = Path(parsed.path).suffix or ".png"
-    file_path = output_dir / f"reference-{uuid.uuid4().hex[:10]}{ext}"
-    file_path.write_bytes(response.content)
-    return file_path
+@dataclass
+class CachedReference:
+    url: str
+    path: Path
+    sha256: str
+    etag: str = ""
+    last_modified: str = ""
+    fetched_at: float = 0.0
+
+    @property
+    def comfy_name(self) -> str:
+        return f"studioai-ref-{self.sha256[:24]}{self.path.suffix}"
+
+
+class ReferenceImageCache:
+    """Process-wide cache of character/emotion reference images.
+
+    Entries are keyed by URL and stored on disk by content hash. Within the TTL an entry is
+    served without a request; after it, the URL is revalidated with ETag/Last-Modified.
+    """
+
+    def __init__(self, root: Path, ttl_seconds: float, max_entries: int) -> None:
+        self.root = root
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._entries: OrderedDict[str, CachedReference] = OrderedDict()
+        self._url_locks: dict[str, threading.Lock] = {}
+        self._lock = threading.Lock()
+
+    def fetch(self, url: str) -> CachedReference:
+        with self._lock:
+            url_lock = self._url_locks.setdefault(url, threading.Lock())
+        with url_lock:
+            with self._lock:
+                entry = self._entries.get(url)
+                if entry:
+                    self._entries.move_to_end(url)
+            if entry and not entry.path.exists():
+                entry = None
+            if entry and time.time() - entry.fetched_at < self.ttl_seconds:
+                return entry
+
+            headers: dict[str, str] = {}
+            if entry and entry.etag:
+                headers["If-None-Match"] = entry.etag
+            if entry and entry.last_modified:
+                headers["If-Modified-Since"] = entry.last_modified
+            response = get_http_session("reference").get(url, headers=headers, timeout=get_http_timeout("reference"))
+            if entry and response.status_code == 304:
+                entry.fetched_at = time.time()
+                return entry
+            response.raise_for_status()
+
+            content = response.content
+            sha256 = hashlib.sha256(content).hexdigest()
+            ext = (Path(urlparse(url).path).suffix or ".png").lower()
+            file_path = self.root / f"{sha256}{ext}"
+            if not file_path.exists():
+                self.root.mkdir(parents=True, exist_ok=True)
+                tmp_path = file_path.with_suffix(f".{uuid.uuid4().hex[:8]}.tmp")
+                tmp_path.write_bytes(content)
+                os.replace(tmp_path, file_path)
+            entry = CachedReference(
+                url=url,
+                path=file_path,
+                sha256=sha256,
+                etag=response.headers.get("ETag", ""),
+                last_modified=response.headers.get("Last-Modified", ""),
+                fetched_at=time.time(),
+            )
+            with self._lock:
+                self._entries[url] = entry
+                self._entries.move_to_end(url)
+                self._evict_locked()
+            return entry
+
+    def _evict_locked(self) -> None:
+        while len(self._entries) > self.max_entries:
+            _, evicted = self._entries.popitem(last=False)
+            self._url_locks.pop(evicted.url, None)
+            if all(e.sha256 != evicted.sha256 for e in self._entries.values()):
+                evicted.path.unlink(missing_ok=True)
+
+
+_reference_cache: ReferenceImageCache | None = None
+_reference_cache_lock = threading.Lock()
+
+
+def get_reference_cache() -> ReferenceImageCache:
+    global _reference_cache
+    with _reference_cache_lock:
+        if _reference_cache is None:
+            root = Path(
+                os.getenv("RENDER_REFERENCE_CACHE_DIR")
+                or Path(tempfile.gettempdir()) / "studioai-cache" / "references"
+            )
+            _reference_cache = ReferenceImageCache(
+                root,
+                ttl_seconds=max(0.0, parse_float(os.getenv("RENDER_REFERENCE_CACHE_TTL_SECONDS", 600), 600.0)),
+                max_entries=max(1, parse_int(os.getenv("RENDER_REFERENCE_CACHE_MAX_ENTRIES", 256), 256)),
+            )
+        return _reference_cache
 
 
-def upload_image_to_comfy(comfyui_url: str, image_path: Path) -> str:
+def upload_image_to_comfy(comfyui_url: str, image_path: Path, upload_name: str | None = None) -> str:
     mime_type = mimetypes.guess_type(image_path.name)[0] or "application/octet-stream"
     with image_path.open("rb") as handle:
-        files = {"image": (image_path.name, handle, mime_type)}
+        files = {"image": (upload_name or image_path.name, handle, mime_type)}
         data = {"type": "input", "overwrite": "true"}
-        response = requests.post(f"{normalize_url(comfyui_url)}/upload/image", files=files, data=data, timeout=60)
+        response = get_http_session("comfy").post(
+            f"{normalize_url(comfyui_url)}/upload/image",
+            files=files,
+            data=data,
+            timeout=get_http_timeout("comfy", 60),
+        )
     response.raise_for_status()
     payload = response.json()
     image_name = payload.get("name")
@@ -506,6 +1497,10 @@ def upload_image_to_comfy(comfyui_url: str, image_path: Path) -> str:
     return str(image_name)
 
 
+class RenderJobCancelled(RuntimeError):
+    """Raised inside a render job once POST /jobs/{job_id}/cancel has been called for it."""
+
+
 def queue_prompt(comfyui_url: str, workflow: dict[str, Any], client_id: str) -> str:
     payload = {"prompt": workflow, "client_id": client_id}
     data = comfy_post_json(comfyui_url, "/prompt", payload, timeout=30)
@@ -515,9 +1510,13 @@ def queue_prompt(comfyui_url: str, workflow: dict[str, Any], client_id: str) ->
     return str(prompt_id)
 
 
-def wait_for_prompt_history(comfyui_url: str, prompt_id: str, timeout_seconds: int) -> dict[str, Any]:
+def wait_for_prompt_history(
+    comfyui_url: str, prompt_id: str, timeout_seconds: int, cancelled: Callable[[], bool] | None = None
+) -> dict[str, Any]:
     deadline = time.time() + timeout_seconds
     while time.time() < deadline:
+        if cancelled is not None and cancelled():
+            raise RenderJobCancelled(f"ComfyUI prompt {prompt_id} cancelled")
         history = comfy_get_json(comfyui_url, f"/history/{prompt_id}", timeout=15)
         if prompt_id in history:
             return history[prompt_id]
@@ -525,16 +1524,241 @@ def wait_for_prompt_history(comfyui_url: str, prompt_id: str, timeout_seconds: i
     raise TimeoutError(f"ComfyUI prompt timeout after {timeout_seconds}s: {prompt_id}")
 
 
-def extract_output_images(history_item: dict[str, Any]) -> list[dict[str, Any]]:
-    images: list[dict[str, Any]] = []
+class PromptEvents:
+    def __init__(self) -> None:
+        self.done = threading.Event()
+        self.error: str | None = None
+        self.outputs: dict[str, Any] = {}
+        self.on_progress: Callable[[float], None] | None = None
+        self.updated_at = time.time()
+
+
+class ComfyEventStream:
+    """Single /ws subscription per ComfyUI node; events are fanned out to waiters by prompt_id."""
+
+    STALE_PROMPT_SECONDS = 900
+
+    def __init__(self, base_url: str) -> None:
+        self.base_url = normalize_url(base_url)
+        self.client_id = f"studioai-{uuid.uuid4().hex[:10]}"
+        self.connected = threading.Event()
+        self._lock = threading.Lock()
+        self._prompts: dict[str, PromptEvents] = {}
+        self._thread: threading.Thread | None = None
+
+    @property
+    def ws_url(self) -> str:
+        scheme, _, rest = self.base_url.partition("://")
+        ws_scheme = "wss" if scheme == "https" else "ws"
+        return f"{ws_scheme}://{rest}/ws?clientId={self.client_id}"
+
+    def ensure_started(self, connect_wait_seconds: float = 2.0) -> None:
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(
+                    target=self._run, name=f"comfy-ws-{self.client_id}", daemon=True
+                )
+                self._thread.start()
+        self.connected.wait(connect_wait_seconds)
+
+    def track(self, prompt_id: str, on_progress: Callable[[float], None] | None = None) -> PromptEvents:
+        with self._lock:
+            state = self._prompts.setdefault(prompt_id, PromptEvents())
+            state.on_progress = on_progress
+            return state
+
+    def abort(self, prompt_id: str, reason: str) -> None:
+        # Wakes a waiter for a prompt that will never report back (deleted from the queue or interrupted).
+        with self._lock:
+            state = self._prompts.get(prompt_id)
+        if state is not None and not state.done.is_set():
+            state.error = reason
+            state.done.set()
+
+    def release(self, prompt_id: str) -> None:
+        now = time.time()
+        with self._lock:
+            self._prompts.pop(prompt_id, None)
+            stale = [pid for pid, s in self._prompts.items() if now - s.updated_at > self.STALE_PROMPT_SECONDS]
+            for pid in stale:
+                self._prompts.pop(pid, None)
+
+    def _run(self) -> None:
+        backoff = 1.0
+        while True:
+            try:
+                conn = websocket.create_connection(self.ws_url, timeout=10)
+            except Exception:
+                time.sleep(backoff)
+                backoff = min(30.0, backoff * 2)
+                continue
+            backoff = 1.0
+            self.connected.set()
+            try:
+                conn.settimeout(30)
+                while True:
+                    try:
+                        message = conn.recv()
+                    except websocket.WebSocketTimeoutException:
+                        conn.ping()
+                        continue
+                    if isinstance(message, str) and message:
+                        self._dispatch(message)
+            except Exception:
+                pass
+            finally:
+                self.connected.clear()
+                try:
+                    conn.close()
+                except Exception:
+                    pass
+
+    def _dispatch(self, raw: str) -> None:
+        try:
+            message = json.loads(raw)
+        except ValueError:
+            return
+        event_type = message.get("type")
+        data = message.get("data") or {}
+        prompt_id = data.get("prompt_id")
+        if not prompt_id:
+            return
+        with self._lock:
+            state = self._prompts.setdefault(str(prompt_id), PromptEvents())
+            state.updated_at = time.time()
+        if event_type == "executed" and isinstance(data.get("output"), dict):
+            state.outputs[str(data.get("node"))] = data["output"]
+        elif event_type == "progress" and state.on_progress:
+            maximum = parse_float(data.get("max"), 0.0)
+            if maximum > 0:
+                state.on_progress(min(1.0, parse_float(data.get("value"), 0.0) / maximum))
+        elif event_type == "execution_error":
+            state.error = str(data.get("exception_message") or "execution error")
+            state.done.set()
+        elif event_type == "execution_interrupted":
+            state.error = "execution interrupted"
+            state.done.set()
+        elif event_type == "execution_success" or (event_type == "executing" and data.get("node") is None):
+            state.done.set()
+
+
+_event_streams: dict[str, ComfyEventStream] = {}
+_event_streams_lock = threading.Lock()
+
+
+def get_comfy_event_stream(comfyui_url: str) -> ComfyEventStream | None:
+    if websocket is None or not parse_bool(os.getenv("COMFYUI_USE_WEBSOCKET", "true"), True):
+        return None
+    key = normalize_url(comfyui_url)
+    with _event_streams_lock:
+        stream = _event_streams.get(key)
+        if stream is None:
+            stream = ComfyEventStream(key)
+            _event_streams[key] = stream
+    stream.ensure_started()
+    return stream
+
+
+def wait_for_prompt_completion(
+    comfyui_url: str,
+    prompt_id: str,
+    timeout_seconds: int,
+    stream: ComfyEventStream | None = None,
+    on_progress: Callable[[float], None] | None = None,
+    cancelled: Callable[[], bool] | None = None,
+) -> dict[str, Any]:
+    if stream is None:
+        return wait_for_prompt_history(comfyui_url, prompt_id, timeout_seconds, cancelled)
+
+    deadline = time.time() + timeout_seconds
+    state = stream.track(prompt_id, on_progress)
+    try:
+        while True:
+            remaining = deadline - time.time()
+            if remaining <= 0:
+                raise TimeoutError(f"ComfyUI prompt timeout after {timeout_seconds}s: {prompt_id}")
+            socket_live = stream.connected.is_set()
+            if socket_live and not state.done.is_set():
+                state.done.wait(min(remaining, 5.0))
+            if cancelled is not None and cancelled():
+                raise RenderJobCancelled(f"ComfyUI prompt {prompt_id} cancelled")
+            if state.done.is_set():
+                if state.error:
+                    raise RuntimeError(f"ComfyUI prompt {prompt_id} failed: {state.error}")
+                if state.outputs:
+                    return {"outputs": dict(state.outputs)}
+            # Safety net for missed events and for the gap while the socket reconnects.
+            history = comfy_get_json(comfyui_url, f"/history/{prompt_id}", timeout=15)
+            if prompt_id in history:
+                return history[prompt_id]
+            if state.done.is_set():
+                time.sleep(0.25)
+            elif not socket_live:
+                time.sleep(min(1.2, max(0.0, deadline - time.time())))
+    finally:
+        stream.release(prompt_id)
+
+
+def comfy_queue_prompt_ids(comfyui_url: str) -> tuple[set[str], set[str]]:
+    """Ids of the prompts a node is running and of those still waiting in its queue."""
+    queue = comfy_get_json(comfyui_url, "/queue")
+
+    def ids(items: Any) -> set[str]:
+        return {str(item[1]) for item in items or [] if isinstance(item, list) and len(item) > 1}
+
+    return ids(queue.get("queue_running")), ids(queue.get("queue_pending"))
+
+
+def cancel_comfy_prompts(comfyui_url: str, prompt_ids: list[str]) -> None:
+    """Delete queued prompts from a node and interrupt the one it is running, if it is one of them.
+
+    Older ComfyUI builds ignore the prompt_id in an /interrupt body and stop whatever is running,
+    so the node is only interrupted after /queue confirms the running prompt is still ours.
+    """
+    base_url = normalize_url(comfyui_url)
+    session = get_http_session("comfy")
+    running, pending = comfy_queue_prompt_ids(base_url)
+    queued = [prompt_id for prompt_id in prompt_ids if prompt_id in pending]
+    if queued:
+        session.post(f"{base_url}/queue", json={"delete": queued}, timeout=get_http_timeout("comfy", 10)).raise_for_status()
+    for prompt_id in prompt_ids:
+        if prompt_id not in running:
+            continue
+        if queued:
+            # Deleting took a round trip; the prompt may have finished and handed the node to another one.
+            running, _ = comfy_queue_prompt_ids(base_url)
+            if prompt_id not in running:
+                continue
+        session.post(
+            f"{base_url}/interrupt", json={"prompt_id": prompt_id}, timeout=get_http_timeout("comfy", 10)
+        ).raise_for_status()
+        break
+    with _event_streams_lock:
+        stream = _event_streams.get(base_url)
+    if stream is not None:
+        for prompt_id in prompt_ids:
+            stream.abort(prompt_id, "cancelled")
+
+
+def extract_output_images(history_item: dict[str, Any], output_node_ids: list[str] | None = None) -> list[dict[str, Any]]:
+    """Saved images of one output node, in batch order.
+
+    Preview and temp images are skipped. The first of output_node_ids (or, without them, of the
+    history's output nodes) that saved any image is used, so takes never mix nodes.
+    """
     outputs = history_item.get("outputs", {}) if isinstance(history_item, dict) else {}
-    for node_output in outputs.values():
+    for node_id in output_node_ids or list(outputs):
+        node_output = outputs.get(str(node_id))
         if not isinstance(node_output, dict):
             continue
-        for img in node_output.get("images", []) or []:
-            if isinstance(img, dict) and img.get("filename"):
-                images.append(img)
-    return images
+        images = [
+            img
+            for img in node_output.get("images", []) or []
+            if isinstance(img, dict) and img.get("filename") and img.get("type", "output") == "output"
+        ]
+        if images:
+            return images
+    return []
 
 
 def download_comfy_image(comfyui_url: str, image_meta: dict[str, Any], output_path: Path) -> Path:
@@ -543,36 +1767,199 @@ def download_comfy_image(comfyui_url: str, image_meta: dict[str, Any], output_pa
         "subfolder": image_meta.get("subfolder", ""),
         "type": image_meta.get("type", "output"),
     }
-    response = requests.get(f"{normalize_url(comfyui_url)}/view", params=params, timeout=60)
+    response = get_http_session("comfy").get(
+        f"{normalize_url(comfyui_url)}/view", params=params, timeout=get_http_timeout("comfy", 60)
+    )
     response.raise_for_status()
     output_path.write_bytes(response.content)
     return output_path
 
 
+def compute_keyframe_cache_key(
+    workflow_template: CompiledWorkflow | None,
+    checkpoint: str | None,
+    positive_prompt: str,
+    negative_prompt: str,
+    seed: int,
+    config: dict[str, Any],
+    reference_sha256: str | None = None,
+    lora_name: str | None = None,
+    batch_size: int = 1,
+) -> str | None:
+    # The fully patched graph already carries prompts, seed, sampler settings, resolution and
+    # checkpoint. The output prefix is fixed and the reference is named by its content hash so
+    # per-run upload names do not change the key.
+    try:
+        workflow = build_shot_workflow(
+            workflow_template,
+            checkpoint,
+            "keyframe",
+            positive_prompt,
+            negative_prompt,
+            seed,
+            config,
+            comfy_input_image=f"sha256-{reference_sha256}" if reference_sha256 else None,
+            lora_name=lora_name,
+            batch_size=batch_size,
+        )
+    except RuntimeError:
+        return None
+    material = json.dumps(
+        {"v": 1, "workflow": workflow, "reference_sha256": reference_sha256 or ""},
+        sort_keys=True,
+        separators=(",", ":"),
+    )
+    return hashlib.sha256(material.encode("utf-8")).hexdigest()
+
+
+class KeyframeCache:
+    """Disk-backed, size-bounded LRU of rendered keyframes keyed by compute_keyframe_cache_key."""
+
+    def __init__(self, root: Path, max_bytes: int) -> None:
+        self.root = root
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._total_bytes: int | None = None
+
+    def _path_for(self, key: str) -> Path:
+        return self.root / key[:2] / f"{key}.png"
+
+    def contains(self, key: str) -> bool:
+        return self._path_for(key).is_file()
+
+    def get(self, key: str, output_path: Path) -> Path | None:
+        cached = self._path_for(key)
+        try:
+            shutil.copyfile(cached, output_path)
+            os.utime(cached)
+        except OSError:
+            return None
+        return output_path
+
+    def put(self, key: str, frame_path: Path) -> None:
+        target = self._path_for(key)
+        try:
+            size = frame_path.stat().st_size
+            if size <= 0 or size > self.max_bytes:
+                return
+            target.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path = target.with_suffix(f".{uuid.uuid4().hex[:8]}.tmp")
+            shutil.copyfile(frame_path, tmp_path)
+            replaced = target.stat().st_size if target.exists() else 0
+            os.replace(tmp_path, target)
+        except OSError:
+            return
+        with self._lock:
+            if self._total_bytes is not None:
+                self._total_bytes += size - replaced
+        self._evict_if_needed()
+
+    def _evict_if_needed(self) -> None:
+        with self._lock:
+            if self._total_bytes is not None and self._total_bytes <= self.max_bytes:
+                return
+            entries: list[tuple[float, int, Path]] = []
+            for path in self.root.glob("*/*.png"):
+                try:
+                    stat = path.stat()
+                except OSError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, path))
+            total = sum(size for _, size, _ in entries)
+            entries.sort()
+            for _, size, path in entries:
+                if total <= self.max_bytes:
+                    break
+                try:
+                    path.unlink()
+                    total -= size
+                except OSError:
+                    continue
+            self._total_bytes = total
+
+
+_keyframe_cache: KeyframeCache | None = None
+_keyframe_cache_lock = threading.Lock()
+
+
+def get_keyframe_cache() -> KeyframeCache | None:
+    global _keyframe_cache
+    max_mb = parse_int(os.getenv("RENDER_KEYFRAME_CACHE_MAX_MB", 2048), 2048)
+    if max_mb <= 0:
+        return None
+    with _keyframe_cache_lock:
+        if _keyframe_cache is None:
+            root = Path(
+                os.getenv("RENDER_KEYFRAME_CACHE_DIR")
+                or Path(tempfile.gettempdir()) / "studioai-cache" / "keyframes"
+            )
+            _keyframe_cache = KeyframeCache(root, max_mb * 1024 * 1024)
+        return _keyframe_cache
+
+
+def parse_hex_colour(colour: str) -> tuple[int, int, int]:
+    value = colour.lstrip("#")
+    return int(value[0:2], 16), int(value[2:4], 16), int(value[4:6], 16)
+
+
+def encode_solid_png(width: int, height: int, colour: str) -> bytes:
+    def chunk(kind: bytes, data: bytes) -> bytes:
+        return len(data).to_bytes(4, "big") + kind + data + zlib.crc32(kind + data).to_bytes(4, "big")
+
+    row = b"\x00" + bytes(parse_hex_colour(colour)) * width
+    header = width.to_bytes(4, "big") + height.to_bytes(4, "big") + bytes([8, 2, 0, 0, 0])
+    return (
+        b"\x89PNG\r\n\x1a\n"
+        + chunk(b"IHDR", header)
+        + chunk(b"IDAT", zlib.compress(row * height, 6))
+        + chunk(b"IEND", b"")
+    )
+
+
+def load_title_font(size: int) -> Any:
+    for candidate in (os.getenv("RENDER_TITLE_FONT_PATH"), "DejaVuSans.ttf", "Arial.ttf"):
+        if not candidate:
+            continue
+        try:
+            return ImageFont.truetype(candidate, size)
+        except OSError:
+            continue
+    try:
+        return ImageFont.load_default(size=size)
+    except TypeError:  # Pillow < 10.1 only ships the fixed-size bitmap font.
+        return ImageFont.load_default()
+
+
+@lru_cache(maxsize=64)
+def synthesize_frame_png(width: int, height: int, text: str, colour: str) -> bytes | None:
+    """PNG bytes for a solid frame, optionally with centred white text; None if text needs Pillow."""
+    if not text:
+        return encode_solid_png(width, height, colour)
+    if Image is None:
+        return None
+    image = Image.new("RGB", (width, height), parse_hex_colour(colour))
+    draw = ImageDraw.Draw(image)
+    font = load_title_font(42)
+    left, top, right, bottom = draw.textbbox((0, 0), text, font=font)
+    draw.text(((width - (right - left)) / 2 - left, (height - (bottom - top)) / 2 - top), text, font=font, fill="white")
+    buffer = io.BytesIO()
+    image.save(buffer, format="PNG")
+    return buffer.getvalue()
+
+
 def render_fallback_frame(output_path: Path, width: int, height: int) -> Path:
-    ffmpeg_bin = get_ffmpeg_path()
-    if shutil.which(ffmpeg_bin):
-        cmd = [
-            ffmpeg_bin,
-            "-y",
-            "-f",
-            "lavfi",
-            "-i",
-            f"color=c=black:s={width}x{height}",
-            "-frames:v",
-            "1",
-            str(output_path),
-        ]
-        subprocess.run(cmd, check=False, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
-        if output_path.exists() and output_path.stat().st_size > 0:
-            return output_path
-    output_path.write_bytes(TRANSPARENT_1PX_PNG)
+    output_path.write_bytes(synthesize_frame_png(width, height, "", FALLBACK_FRAME_COLOUR))
     return output_path
 
 
 def render_title_frame(output_path: Path, width: int, height: int, text: str) -> Path:
-    ffmpeg_bin = get_ffmpeg_path()
     safe_text = (text or "").strip() or "StudioAI"
+    frame = synthesize_frame_png(width, height, safe_text, TITLE_FRAME_COLOUR)
+    if frame is not None:
+        output_path.write_bytes(frame)
+        return output_path
+
+    ffmpeg_bin = get_ffmpeg_path()
     drawtext_text = (
         safe_text.replace("\\", "\\\\")
         .replace(":", "\\:")
@@ -586,7 +1973,7 @@ def render_title_frame(output_path: Path, width: int, height: int, text: str) ->
             "-f",
             "lavfi",
             "-i",
-            f"color=c=#111827:s={width}x{height}",
+            f"color=c={TITLE_FRAME_COLOUR}:s={width}x{height}",
             "-vf",
             f"drawtext=text='{drawtext_text}':fontcolor=white:fontsize=42:x=(w-text_w)/2:y=(h-text_h)/2",
             "-frames:v",
@@ -599,6 +1986,107 @@ def render_title_frame(output_path: Path, width: int, height: int, text: str) ->
     return render_fallback_frame(output_path, width, height)
 
 
+def concat_file_line(path: Path) -> str:
+    """A concat-demuxer `file` directive; quotes in the path are closed, escaped and reopened."""
+    quoted = path.resolve().as_posix().replace("'", "'\\''")
+    return f"file '{quoted}'"
+
+
+def write_concat_manifest(keyframes: list[tuple[Path, float]], manifest_path: Path) -> Path:
+    lines: list[str] = []
+    for frame_path, duration in keyframes:
+        lines.append(concat_file_line(frame_path))
+        lines.append(f"duration {max(0.5, float(duration))}")
+    lines.append(concat_file_line(keyframes[-1][0]))
+    manifest_path.write_text("\n".join(lines) + "\n", encoding="utf-8")
+    return manifest_path
+
+
+class FfmpegProcessPool:
+    """Host-wide limit on concurrent ffmpeg processes, with the CPU cores split between them.
+
+    Jobs finishing at the same time queue for a slot instead of each spawning an encoder
+    that grabs every core.
+    """
+
+    def __init__(self, max_concurrent: int, cpu_count: int) -> None:
+        self.max_concurrent = max_concurrent
+        self.threads_per_encode = max(1, cpu_count // max_concurrent)
+        self._slots = threading.BoundedSemaphore(max_concurrent)
+        self._lock = threading.Lock()
+        self._running = 0
+        self._waiting = 0
+        self._completed = 0
+
+    def encoder_args(self, profile_name: str, fps: int) -> list[str]:
+        profile = ENCODER_PROFILES[parse_encoder_profile(profile_name)]
+        threads = self.threads_per_encode
+        if profile["max_threads"]:
+            threads = min(threads, int(profile["max_threads"]))
+        return [
+            "-c:v",
+            "libx264",
+            "-preset",
+            str(profile["preset"]),
+            "-crf",
+            str(profile["crf"]),
+            "-tune",
+            str(profile["tune"]),
+            "-g",
+            str(max(1, int(fps * profile["gop_seconds"]))),
+            "-threads",
+            str(threads),
+        ]
+
+    def run(self, cmd: list[str], output_path: Path, error_message: str) -> None:
+        with self._lock:
+            self._waiting += 1
+        with measure_stage("ffmpeg_queue"):
+            self._slots.acquire()
+        try:
+            with self._lock:
+                self._waiting -= 1
+                self._running += 1
+            try:
+                with measure_stage("ffmpeg_encode"):
+                    proc = subprocess.run(cmd, check=False, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+            finally:
+                with self._lock:
+                    self._running -= 1
+                    self._completed += 1
+        finally:
+            self._slots.release()
+        if proc.returncode != 0 or not output_path.exists() or output_path.stat().st_size == 0:
+            err = proc.stderr.decode("utf-8", errors="ignore")
+            raise RuntimeError(f"{error_message}: {err[-500:]}")
+
+    def stats(self) -> dict[str, Any]:
+        with self._lock:
+            return {
+                "max_concurrent": self.max_concurrent,
+                "threads_per_encode": self.threads_per_encode,
+                "running": self._running,
+                "waiting": self._waiting,
+                "completed": self._completed,
+            }
+
+
+_ffmpeg_pool: FfmpegProcessPool | None = None
+_ffmpeg_pool_lock = threading.Lock()
+
+
+def get_ffmpeg_pool() -> FfmpegProcessPool:
+    global _ffmpeg_pool
+    with _ffmpeg_pool_lock:
+        if _ffmpeg_pool is None:
+            cpu_count = max(1, parse_int(os.getenv("RENDER_FFMPEG_CPUS"), os.cpu_count() or 1))
+            _ffmpeg_pool = FfmpegProcessPool(
+                max_concurrent=max(1, parse_int(os.getenv("RENDER_MAX_CONCURRENT_ENCODES"), max(1, cpu_count // 4))),
+                cpu_count=cpu_count,
+            )
+        return _ffmpeg_pool
+
+
 def build_video_from_keyframes(
     keyframes: list[tuple[Path, float]],
     output_path: Path,
@@ -606,6 +2094,7 @@ def build_video_from_keyframes(
     width: int,
     height: int,
     require_ffmpeg: bool,
+    encoder_profile: str = "balanced",
 ) -> None:
     ffmpeg_bin = get_ffmpeg_path()
     if not shutil.which(ffmpeg_bin):
@@ -617,16 +2106,8 @@ def build_video_from_keyframes(
     if not keyframes:
         raise RuntimeError("No keyframes were generated")
 
-    manifest_path = output_path.with_suffix(".concat.txt")
-    lines: list[str] = []
-    for frame_path, duration in keyframes:
-        file_line = frame_path.resolve().as_posix().replace("'", "'\\''")
-        lines.append(f"file '{file_line}'")
-        lines.append(f"duration {max(0.5, float(duration))}")
-    last_file = keyframes[-1][0].resolve().as_posix().replace("'", "'\\''")
-    lines.append(f"file '{last_file}'")
-    manifest_path.write_text("\n".join(lines) + "\n", encoding="utf-8")
-
+    manifest_path = write_concat_manifest(keyframes, output_path.with_suffix(".concat.txt"))
+    ffmpeg_pool = get_ffmpeg_pool()
     cmd = [
         ffmpeg_bin,
         "-y",
@@ -643,21 +2124,830 @@ def build_video_from_keyframes(
         "-shortest",
         "-vf",
         f"fps={fps},scale={width}:{height}:flags=lanczos,format=yuv420p",
+        *ffmpeg_pool.encoder_args(encoder_profile, fps),
+        "-c:a",
+        "aac",
+        "-movflags",
+        "+faststart",
+        str(output_path),
+    ]
+    ffmpeg_pool.run(cmd, output_path, "ffmpeg failed to build video")
+
+
+def encode_keyframe_segment(
+    keyframes: list[tuple[Path, float]],
+    output_path: Path,
+    fps: int,
+    width: int,
+    height: int,
+    encoder_profile: str = "balanced",
+) -> Path:
+    manifest_path = write_concat_manifest(keyframes, output_path.with_suffix(".concat.txt"))
+    ffmpeg_pool = get_ffmpeg_pool()
+    cmd = [
+        get_ffmpeg_path(),
+        "-y",
+        "-f",
+        "concat",
+        "-safe",
+        "0",
+        "-i",
+        str(manifest_path),
+        "-vf",
+        f"fps={fps},scale={width}:{height}:flags=lanczos,format=yuv420p",
+        *ffmpeg_pool.encoder_args(encoder_profile, fps),
+        "-an",
+        str(output_path),
+    ]
+    ffmpeg_pool.run(cmd, output_path, f"ffmpeg failed to encode segment {output_path.name}")
+    return output_path
+
+
+def concat_video_segments(segments: list[Path], output_path: Path) -> None:
+    manifest_path = output_path.with_suffix(".segments.txt")
+    lines = [concat_file_line(segment) for segment in segments]
+    manifest_path.write_text("\n".join(lines) + "\n", encoding="utf-8")
+    # Video is stream-copied; only the silent audio track is encoded here.
+    cmd = [
+        get_ffmpeg_path(),
+        "-y",
+        "-f",
+        "concat",
+        "-safe",
+        "0",
+        "-i",
+        str(manifest_path),
+        "-f",
+        "lavfi",
+        "-i",
+        "anullsrc=r=44100:cl=stereo",
+        "-shortest",
         "-c:v",
-        "libx264",
+        "copy",
         "-c:a",
         "aac",
+        "-movflags",
+        "+faststart",
         str(output_path),
     ]
-    proc = subprocess.run(cmd, check=False, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
-    if proc.returncode != 0 or not output_path.exists() or output_path.stat().st_size == 0:
-        err = proc.stderr.decode("utf-8", errors="ignore")
-        raise RuntimeError(f"ffmpeg failed to build video: {err[-500:]}")
+    get_ffmpeg_pool().run(cmd, output_path, "ffmpeg failed to concatenate segments")
+
+
+class SegmentedVideoAssembler:
+    """Encodes finished groups of keyframes into segments while later shots are still rendering.
+
+    Segments are keyed by their position in the episode; finish() waits for the outstanding
+    encodes and stream-copies the segments into the final MP4.
+    """
+
+    def __init__(self, work_dir: Path, fps: int, width: int, height: int, encoder_profile: str) -> None:
+        self.work_dir = work_dir
+        self.fps = fps
+        self.width = width
+        self.height = height
+        self.encoder_profile = encoder_profile
+        self.work_dir.mkdir(parents=True, exist_ok=True)
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="render-segment")
+        self._segments: dict[int, Future] = {}
+
+    def submit(self, position: int, keyframes: list[tuple[Path, float]]) -> None:
+        if not keyframes:
+            return
+        output_path = self.work_dir / f"segment-{position:04d}.mp4"
+        self._segments[position] = self._executor.submit(
+            contextvars.copy_context().run,
+            encode_keyframe_segment,
+            keyframes,
+            output_path,
+            self.fps,
+            self.width,
+            self.height,
+            self.encoder_profile,
+        )
+
+    def finish(self, output_path: Path) -> None:
+        if not self._segments:
+            raise RuntimeError("No keyframes were generated")
+        segments = [self._segments[position].result() for position in sorted(self._segments)]
+        concat_video_segments(segments, output_path)
+
+    def close(self) -> None:
+        self._executor.shutdown(wait=True, cancel_futures=True)
+
+
+def group_shots_into_segments(storyboard: list[ShotPayload], segment_shots: int) -> list[list[int]]:
+    # Every `segment_shots` shots, or one segment per run of consecutive shots in the same scene.
+    groups: list[list[int]] = []
+    for idx, shot in enumerate(storyboard):
+        if groups and (
+            len(groups[-1]) < segment_shots
+            if segment_shots > 0
+            else storyboard[groups[-1][-1]].scene == shot.scene
+        ):
+            groups[-1].append(idx)
+        else:
+            groups.append([idx])
+    return groups
+
+
+ARTIFACT_CHUNK_BYTES = 1024 * 1024
+
+
+class LocalArtifactStore:
+    """Finished episodes kept in a local directory and served by GET /artifacts/{key}.
+
+    Artifacts are grouped per job under <root>/<episode>/<job>. Job directories expire after
+    max_age_seconds, and the oldest ones are evicted whenever the root exceeds quota_bytes.
+    Jobs that are still uploading are never touched.
+    """
+
+    backend = "local"
+
+    def __init__(self, root: Path, quota_bytes: int = 0, max_age_seconds: float = 0.0) -> None:
+        self.root = root.resolve()
+        self.quota_bytes = quota_bytes
+        self.max_age_seconds = max_age_seconds
+        self.root.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._uploading: dict[Path, int] = {}
+        self._evicted = 0
+
+    def _path(self, key: str) -> Path:
+        path = (self.root / key).resolve()
+        if self.root not in path.parents:
+            raise ValueError(f"Invalid artifact key: {key}")
+        return path
+
+    def _job_dir(self, path: Path) -> Path:
+        parts = path.relative_to(self.root).parts
+        return self.root.joinpath(*parts[:2]) if len(parts) > 2 else path.parent
+
+    def put(self, local_path: Path, key: str, content_type: str) -> None:
+        target = self._path(key)
+        job_dir = self._job_dir(target)
+        with self._lock:
+            self._uploading[job_dir] = self._uploading.get(job_dir, 0) + 1
+        try:
+            target.parent.mkdir(parents=True, exist_ok=True)
+            temp_path = target.with_name(f".{target.name}.{uuid.uuid4().hex}.part")
+            with local_path.open("rb") as src, temp_path.open("wb") as dst:
+                shutil.copyfileobj(src, dst, ARTIFACT_CHUNK_BYTES)
+            os.replace(temp_path, target)
+            self.collect_garbage()
+        finally:
+            with self._lock:
+                remaining = self._uploading.pop(job_dir, 1) - 1
+                if remaining > 0:
+                    self._uploading[job_dir] = remaining
+
+    def collect_garbage(self) -> int:
+        if self.quota_bytes <= 0 and self.max_age_seconds <= 0:
+            return 0
+        with self._lock:
+            uploading = set(self._uploading)
+        now = time.time()
+        candidates: list[tuple[float, int, Path]] = []
+        total_bytes = 0
+        for job_dir in self._job_dirs():
+            size = directory_size(job_dir)
+            total_bytes += size
+            if job_dir in uploading:
+                continue
+            try:
+                modified = job_dir.stat().st_mtime
+            except OSError:
+                continue
+            candidates.append((modified, size, job_dir))
+
+        removed = 0
+        for modified, size, job_dir in sorted(candidates):
+            expired = self.max_age_seconds > 0 and now - modified > self.max_age_seconds
+            over_quota = self.quota_bytes > 0 and total_bytes > self.quota_bytes
+            if not expired and not over_quota:
+                continue
+            shutil.rmtree(job_dir, ignore_errors=True)
+            try:
+                job_dir.parent.rmdir()
+            except OSError:
+                pass
+            total_bytes -= size
+            removed += 1
+        if removed:
+            with self._lock:
+                self._evicted += removed
+        return removed
+
+    def usage(self) -> dict[str, Any]:
+        with self._lock:
+            evicted = self._evicted
+        return {
+            "root": str(self.root),
+            "used_bytes": sum(directory_size(job_dir) for job_dir in self._job_dirs()),
+            "quota_bytes": self.quota_bytes,
+            "max_age_seconds": self.max_age_seconds,
+            "evicted_jobs": evicted,
+        }
+
+    def _job_dirs(self) -> list[Path]:
+        if not self.root.exists():
+            return []
+        return [job for episode in self.root.iterdir() if episode.is_dir() for job in episode.iterdir() if job.is_dir()]
+
+    def size(self, key: str) -> int | None:
+        path = self._path(key)
+        return path.stat().st_size if path.is_file() else None
+
+    def iter_range(self, key: str, start: int, end: int) -> Iterator[bytes]:
+        with self._path(key).open("rb") as handle:
+            handle.seek(start)
+            remaining = end - start + 1
+            while remaining > 0:
+                chunk = handle.read(min(ARTIFACT_CHUNK_BYTES, remaining))
+                if not chunk:
+                    break
+                remaining -= len(chunk)
+                yield chunk
+
+
+class S3ArtifactStore:
+    """Finished episodes in an S3-compatible bucket (AWS, MinIO, R2, ...).
+
+    Uploads stream the file in multipart chunks; reads are proxied with ranged GETs so the
+    bucket does not need to be public.
+    """
+
+    backend = "s3"
+
+    def __init__(self, bucket: str, prefix: str, endpoint_url: str, region: str, chunk_bytes: int) -> None:
+        if boto3 is None:
+            raise RuntimeError("RENDER_ARTIFACT_STORE=s3 requires boto3. Install it with `pip install boto3`.")
+        self.bucket = bucket
+        self.prefix = prefix.strip("/")
+        self.client = boto3.client("s3", endpoint_url=endpoint_url or None, region_name=region or None)
+        self.transfer_config = TransferConfig(
+            multipart_threshold=chunk_bytes, multipart_chunksize=chunk_bytes, max_concurrency=4
+        )
+
+    def _object_key(self, key: str) -> str:
+        return f"{self.prefix}/{key}" if self.prefix else key
+
+    def put(self, local_path: Path, key: str, content_type: str) -> None:
+        self.client.upload_file(
+            str(local_path),
+            self.bucket,
+            self._object_key(key),
+            ExtraArgs={"ContentType": content_type},
+            Config=self.transfer_config,
+        )
+
+    def size(self, key: str) -> int | None:
+        try:
+            head = self.client.head_object(Bucket=self.bucket, Key=self._object_key(key))
+        except ClientError as err:
+            if err.response.get("Error", {}).get("Code") in {"404", "NoSuchKey", "NotFound"}:
+                return None
+            raise
+        return int(head["ContentLength"])
+
+    def iter_range(self, key: str, start: int, end: int) -> Iterator[bytes]:
+        response = self.client.get_object(Bucket=self.bucket, Key=self._object_key(key), Range=f"bytes={start}-{end}")
+        yield from response["Body"].iter_chunks(ARTIFACT_CHUNK_BYTES)
+
+    def presigned_url(self, key: str, ttl_seconds: int) -> str:
+        # SigV4 presigned URLs are valid for at most 7 days.
+        return self.client.generate_presigned_url(
+            "get_object",
+            Params={"Bucket": self.bucket, "Key": self._object_key(key)},
+            ExpiresIn=min(ttl_seconds, 7 * 24 * 3600),
+        )
+
+
+_artifact_store: LocalArtifactStore | S3ArtifactStore | None = None
+_artifact_store_lock = threading.Lock()
+
+
+def get_artifact_store() -> LocalArtifactStore | S3ArtifactStore:
+    global _artifact_store
+    with _artifact_store_lock:
+        if _artifact_store is None:
+            backend = (os.getenv("RENDER_ARTIFACT_STORE") or "local").strip().lower()
+            if backend == "s3":
+                bucket = (os.getenv("RENDER_S3_BUCKET") or "").strip()
+                if not bucket:
+                    raise RuntimeError("RENDER_ARTIFACT_STORE=s3 requires RENDER_S3_BUCKET.")
+                _artifact_store = S3ArtifactStore(
+                    bucket=bucket,
+                    prefix=os.getenv("RENDER_S3_PREFIX", ""),
+                    endpoint_url=(os.getenv("RENDER_S3_ENDPOINT_URL") or "").strip(),
+                    region=(os.getenv("RENDER_S3_REGION") or "").strip(),
+                    chunk_bytes=max(5, parse_int(os.getenv("RENDER_S3_MULTIPART_CHUNK_MB", 16), 16)) * 1024 * 1024,
+                )
+            elif backend == "local":
+                root = Path(os.getenv("RENDER_ARTIFACT_DIR") or Path(tempfile.gettempdir()) / "studioai-artifacts")
+                _artifact_store = LocalArtifactStore(
+                    root,
+                    quota_bytes=max(0, parse_int(os.getenv("RENDER_ARTIFACT_QUOTA_MB", 51200), 51200)) * 1024 * 1024,
+                    max_age_seconds=max(0.0, parse_float(os.getenv("RENDER_ARTIFACT_MAX_AGE_HOURS", 0), 0.0)) * 3600,
+                )
+            else:
+                raise RuntimeError(f"Unknown RENDER_ARTIFACT_STORE: {backend}")
+        return _artifact_store
+
+
+def get_artifact_url_ttl_seconds() -> int:
+    return max(60, parse_int(os.getenv("RENDER_ARTIFACT_URL_TTL_SECONDS", 604800), 604800))
+
+
+def get_artifact_signing_key() -> bytes | None:
+    key = (os.getenv("RENDER_ARTIFACT_SIGNING_KEY") or os.getenv("RENDER_API_KEY") or "").strip()
+    return key.encode("utf-8") if key else None
+
+
+def sign_artifact(key: str, expires: int, signing_key: bytes) -> str:
+    return hmac.new(signing_key, f"{key}\n{expires}".encode("utf-8"), hashlib.sha256).hexdigest()
+
+
+def verify_artifact_signature(key: str, expires: int | None, signature: str | None) -> bool:
+    signing_key = get_artifact_signing_key()
+    if signing_key is None or expires is None or not signature or expires < time.time():
+        return False
+    return hmac.compare_digest(sign_artifact(key, expires, signing_key), signature)
+
+
+def artifact_url(key: str) -> str:
+    """URL a browser can play an artifact from without the x-api-key header.
+
+    S3 artifacts get a presigned bucket URL (unless RENDER_S3_PRESIGNED_URLS=false). Otherwise
+    the URL points at GET /artifacts/... and, when a signing key is configured, carries an
+    expiring HMAC signature. It is relative unless RENDER_PUBLIC_URL is set.
+    """
+    ttl_seconds = get_artifact_url_ttl_seconds()
+    store = get_artifact_store()
+    if isinstance(store, S3ArtifactStore) and parse_bool(os.getenv("RENDER_S3_PRESIGNED_URLS", "true"), True):
+        return store.presigned_url(key, ttl_seconds)
+    path = f"/artifacts/{quote(key)}"
+    signing_key = get_artifact_signing_key()
+    if signing_key is not None:
+        expires = int(time.time()) + ttl_seconds
+        path += f"?expires={expires}&signature={sign_artifact(key, expires, signing_key)}"
+    public_url = (os.getenv("RENDER_PUBLIC_URL") or "").strip()
+    return f"{normalize_url(public_url)}{path}" if public_url else path
+
+
+def parse_byte_range(header: str | None, size: int) -> tuple[int, int] | None:
+    """(start, end) inclusive for a single `bytes=` range; None means serve the whole file."""
+    if not header or not header.startswith("bytes=") or "," in header:
+        return None
+    start_text, _, end_text = header[len("bytes="):].strip().partition("-")
+    try:
+        if start_text:
+            start = int(start_text)
+            end = min(int(end_text), size - 1) if end_text else size - 1
+        else:
+            start, end = max(0, size - int(end_text)), size - 1
+    except ValueError:
+        return None
+    if start > end or start >= size:
+        raise HTTPException(status_code=416, detail="Range not satisfiable", headers={"Content-Range": f"bytes */{size}"})
+    return start, end
+
+
+JOB_MANIFEST_NAME = "manifest.json"
+# Episode and job ids name workspace directories, so they must be plain path components.
+WORKSPACE_ID_PATTERN = re.compile(r"[A-Za-z0-9][A-Za-z0-9._-]{0,127}")
+
+
+class JobManifest:
+    """Per-job record of every shot's inputs hash, status and frames, kept in the job workspace.
+
+    It is rewritten after each shot, so a job that is resubmitted (or picked up again on startup)
+    after a crash only renders the shots whose frames are missing or whose inputs changed.
+    """
+
+    def __init__(self, job_dir: Path, data: dict[str, Any]) -> None:
+        self.job_dir = job_dir
+        self.data = data
+
+    @classmethod
+    def load(cls, job_dir: Path) -> "JobManifest | None":
+        try:
+            data = json.loads((job_dir / JOB_MANIFEST_NAME).read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            return None
+        if not isinstance(data, dict) or not isinstance(data.get("shots"), dict):
+            return None
+        return cls(job_dir, data)
+
+    @classmethod
+    def start(cls, job_dir: Path, req: RenderRequest) -> "JobManifest":
+        previous = cls.load(job_dir)
+        manifest = cls(
+            job_dir,
+            {
+                "v": 1,
+                "episode_id": req.episode_id,
+                "job_id": req.job_id,
+                "status": "running",
+                "started_at": time.time(),
+                "request": req.model_dump(mode="json"),
+                "shots": previous.data["shots"] if previous else {},
+                # Startup resumes since the job last finished, so a job that keeps crashing the server is given up on.
+                "resume_attempts": previous.resume_attempts if previous and previous.status == "running" else 0,
+            },
+        )
+        manifest.save()
+        return manifest
+
+    @property
+    def status(self) -> str:
+        return str(self.data.get("status") or "")
+
+    @property
+    def resume_attempts(self) -> int:
+        return parse_int(self.data.get("resume_attempts"), 0)
+
+    def record_resume_attempt(self) -> int:
+        self.data["resume_attempts"] = self.resume_attempts + 1
+        self.save()
+        return self.resume_attempts
+
+    def rendered_takes(self) -> dict[str, list[Path]]:
+        """Inputs hash -> takes for every rendered shot whose frames are still on disk."""
+        result: dict[str, list[Path]] = {}
+        for entry in self.data["shots"].values():
+            if not isinstance(entry, dict) or entry.get("status") != "rendered" or not entry.get("inputs_hash"):
+                continue
+            takes = [self.job_dir / str(take) for take in entry.get("takes") or []]
+            if takes and all(take.is_file() and take.stat().st_size > 0 for take in takes):
+                result[str(entry["inputs_hash"])] = takes
+        return result
+
+    def record_shot(self, index: int, inputs_hash: str | None, takes: list[Path], status: str) -> None:
+        self.data["shots"][str(index)] = {
+            "inputs_hash": inputs_hash,
+            "status": status,
+            "takes": [take.relative_to(self.job_dir).as_posix() for take in takes],
+            "updated_at": time.time(),
+        }
+        self.save()
+
+    def finish(self, status: str) -> None:
+        self.data["status"] = status
+        self.data["finished_at"] = time.time()
+        self.save()
+
+    def save(self) -> None:
+        path = self.job_dir / JOB_MANIFEST_NAME
+        temp_path = path.with_name(f".{path.name}.{uuid.uuid4().hex}.part")
+        temp_path.write_text(json.dumps(self.data, separators=(",", ":")), encoding="utf-8")
+        os.replace(temp_path, path)
+
+
+def directory_size(path: Path) -> int:
+    total = 0
+    for dirpath, _, filenames in os.walk(path):
+        for filename in filenames:
+            try:
+                total += (Path(dirpath) / filename).stat().st_size
+            except OSError:
+                continue
+    return total
+
+
+class RenderWorkspaceManager:
+    """Owns the per-job scratch directories under <root>/<episode>/<job>.
+
+    After a successful job its intermediates are removed according to the retention policy
+    (none: delete the workspace, frames: keep only keyframes, all: keep everything). Kept and
+    failed workspaces expire after max_age_seconds, and the oldest inactive ones are evicted
+    whenever the root exceeds quota_bytes. Workspaces of running jobs are never touched.
+    """
+
+    RETENTION_POLICIES = ("none", "frames", "all")
+
+    def __init__(self, root: Path, quota_bytes: int, retention: str, max_age_seconds: float) -> None:
+        self.root = root
+        self.quota_bytes = quota_bytes
+        self.retention = retention if retention in self.RETENTION_POLICIES else "none"
+        self.max_age_seconds = max_age_seconds
+        self.root.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._active: set[Path] = set()
+        self._evicted = 0
+
+    def job_dir(self, episode_id: str, job_id: str) -> Path:
+        """<root>/<episode>/<job>; raises ValueError for ids that are not plain names inside the root."""
+        for value in (episode_id, job_id):
+            if not WORKSPACE_ID_PATTERN.fullmatch(value):
+                raise ValueError(f"Invalid workspace id: {value!r}")
+        job_dir = self.root / episode_id / job_id
+        if self.root.resolve() not in job_dir.resolve().parents:
+            raise ValueError(f"Invalid workspace id: {episode_id}/{job_id}")
+        return job_dir
+
+    def create(self, episode_id: str, job_id: str) -> Path:
+        job_dir = self.job_dir(episode_id, job_id)
+        with self._lock:
+            self._active.add(job_dir)
+        self.collect_garbage()
+        job_dir.mkdir(parents=True, exist_ok=True)
+        return job_dir
+
+    def finish(self, job_dir: Path, succeeded: bool) -> int:
+        used_bytes = directory_size(job_dir)
+        if succeeded and self.retention == "none":
+            shutil.rmtree(job_dir, ignore_errors=True)
+            self._remove_if_empty(job_dir.parent)
+        elif succeeded and self.retention == "frames":
+            for child in job_dir.iterdir():
+                if child.name == "frames":
+                    continue
+                if child.is_dir():
+                    shutil.rmtree(child, ignore_errors=True)
+                else:
+                    child.unlink(missing_ok=True)
+        with self._lock:
+            self._active.discard(job_dir)
+        self.collect_garbage()
+        return used_bytes
+
+    def collect_garbage(self) -> int:
+        with self._lock:
+            active = set(self._active)
+        now = time.time()
+        inactive: list[tuple[float, int, Path]] = []
+        total_bytes = 0
+        for job_dir in self._job_dirs():
+            size = directory_size(job_dir)
+            total_bytes += size
+            if job_dir in active:
+                continue
+            try:
+                modified = job_dir.stat().st_mtime
+            except OSError:
+                continue
+            inactive.append((modified, size, job_dir))
+
+        removed = 0
+        for modified, size, job_dir in sorted(inactive):
+            expired = self.max_age_seconds > 0 and now - modified > self.max_age_seconds
+            over_quota = self.quota_bytes > 0 and total_bytes > self.quota_bytes
+            if not expired and not over_quota:
+                continue
+            shutil.rmtree(job_dir, ignore_errors=True)
+            self._remove_if_empty(job_dir.parent)
+            total_bytes -= size
+            removed += 1
+        if removed:
+            with self._lock:
+                self._evicted += removed
+        return removed
+
+    def usage(self) -> dict[str, Any]:
+        with self._lock:
+            active = set(self._active)
+            evicted = self._evicted
+        jobs: list[dict[str, Any]] = []
+        for job_dir in self._job_dirs():
+            try:
+                modified = job_dir.stat().st_mtime
+            except OSError:
+                continue
+            jobs.append(
+                {
+                    "episode_id": job_dir.parent.name,
+                    "job_id": job_dir.name,
+                    "bytes": directory_size(job_dir),
+                    "active": job_dir in active,
+                    "modified_at": modified,
+                }
+            )
+        jobs.sort(key=lambda job: job["modified_at"])
+        return {
+            "root": str(self.root),
+            "used_bytes": sum(job["bytes"] for job in jobs),
+            "quota_bytes": self.quota_bytes,
+            "retention": self.retention,
+            "max_age_seconds": self.max_age_seconds,
+            "evicted_jobs": evicted,
+            "jobs": jobs,
+        }
+
+    def manifests(self, episode_id: str | None = None) -> list[JobManifest]:
+        """Job manifests on disk, newest first, optionally limited to one episode."""
+        job_dirs = self._job_dirs()
+        if episode_id is not None:
+            job_dirs = [job_dir for job_dir in job_dirs if job_dir.parent.name == episode_id]
+        manifests = [manifest for manifest in map(JobManifest.load, job_dirs) if manifest]
+        return sorted(manifests, key=lambda manifest: float(manifest.data.get("started_at") or 0), reverse=True)
+
+    def _job_dirs(self) -> list[Path]:
+        if not self.root.exists():
+            return []
+        return [job for episode in self.root.iterdir() if episode.is_dir() for job in episode.iterdir() if job.is_dir()]
+
+    def _remove_if_empty(self, path: Path) -> None:
+        try:
+            path.rmdir()
+        except OSError:
+            pass
+
+
+_workspace_manager: RenderWorkspaceManager | None = None
+_workspace_manager_lock = threading.Lock()
+
+
+def get_workspace_manager() -> RenderWorkspaceManager:
+    global _workspace_manager
+    with _workspace_manager_lock:
+        if _workspace_manager is None:
+            root = Path(os.getenv("RENDER_WORKSPACE_DIR") or Path(tempfile.gettempdir()) / "studioai-renders")
+            _workspace_manager = RenderWorkspaceManager(
+                root=root,
+                quota_bytes=max(0, parse_int(os.getenv("RENDER_WORKSPACE_QUOTA_MB", 20480), 20480)) * 1024 * 1024,
+                retention=(os.getenv("RENDER_WORKSPACE_RETENTION") or "none").strip().lower(),
+                max_age_seconds=max(0.0, parse_float(os.getenv("RENDER_WORKSPACE_MAX_AGE_HOURS", 72), 72.0)) * 3600,
+            )
+        return _workspace_manager
+
+
+_builtin_workflows: dict[tuple[str, bool], CompiledWorkflow] = {}
+
+
+def get_builtin_workflow(checkpoint: str, img2img: bool, config: dict[str, Any]) -> CompiledWorkflow:
+    # Everything config-dependent in the built-in graphs is overwritten by instantiate().
+    key = (checkpoint, img2img)
+    with _workflow_template_lock:
+        compiled = _builtin_workflows.get(key)
+        if compiled is None:
+            if img2img:
+                graph = build_builtin_workflow_img2img(checkpoint, "", "", config)
+            else:
+                graph = build_builtin_workflow_text2img(checkpoint, "", config)
+            compiled = CompiledWorkflow(graph)
+            _builtin_workflows[key] = compiled
+        return compiled
+
+
+def build_shot_workflow(
+    workflow_template: CompiledWorkflow | None,
+    checkpoint: str | None,
+    prefix: str,
+    positive_prompt: str,
+    negative_prompt: str,
+    seed: int,
+    config: dict[str, Any],
+    comfy_input_image: str | None = None,
+    batch_size: int = 1,
+    lora_name: str | None = None,
+) -> dict[str, Any]:
+    if workflow_template is None:
+        if not checkpoint:
+            raise RuntimeError(
+                "No checkpoint available. Set COMFYUI_CHECKPOINT or install a checkpoint model and restart ComfyUI."
+            )
+        workflow_template = get_builtin_workflow(checkpoint, bool(comfy_input_image), config)
+    return workflow_template.instantiate(
+        positive_prompt, negative_prompt, seed, prefix, config, comfy_input_image=comfy_input_image, batch_size=batch_size, lora_name=lora_name
+    )
+
+
+def describe_model_set(workflow_template: CompiledWorkflow | None, checkpoint: str | None, lora_name: str | None) -> str | None:
+    """Stable description of the checkpoint + LoRA set a shot's prompt loads, used for node affinity."""
+    if workflow_template is None:
+        return f"ckpt:{checkpoint}" if checkpoint else None
+    checkpoints, loras = workflow_template.model_set(lora_name)
+    if not checkpoints and not loras:
+        return None
+    return "|".join([*(f"ckpt:{name}" for name in sorted(checkpoints)), *(f"lora:{name}" for name in sorted(loras))])
+
+
+def describe_shot_shape(
+    config: dict[str, Any], workflow_template: CompiledWorkflow | None, img2img: bool, models: str | None
+) -> str:
+    """Resolution, step count and workflow variant: the parts of a shot that decide how long ComfyUI takes."""
+    variant = "custom" if workflow_template is not None else "builtin"
+    mode = "img2img" if img2img else "txt2img"
+    return (
+        f"{config['width']}x{config['height']}/{config['steps']}steps/{variant}-{mode}"
+        f"/x{config['takes_per_shot']}/{models or 'default'}"
+    )
+
+
+class ShotDurationStats:
+    """Recent prompt durations (queued to finished) per ComfyUI node and shot shape.
+
+    Predictions use the node's own samples once it has enough of them and fall back to every
+    node's samples for the same shape, so a newly added node gets a deadline straight away.
+    """
+
+    ALL_NODES = "*"
+
+    def __init__(self, window: int, min_samples: int) -> None:
+        self.window = window
+        self.min_samples = min_samples
+        self._lock = threading.Lock()
+        self._samples: dict[tuple[str, str], deque[float]] = {}
+
+    def record(self, node_url: str, shape: str, seconds: float) -> None:
+        with self._lock:
+            for key in ((node_url, shape), (self.ALL_NODES, shape)):
+                self._samples.setdefault(key, deque(maxlen=self.window)).append(seconds)
+
+    def percentile(self, node_url: str, shape: str, percentile: float, min_samples: int | None = None) -> float | None:
+        min_samples = self.min_samples if min_samples is None else min_samples
+        with self._lock:
+            for key in ((node_url, shape), (self.ALL_NODES, shape)):
+                samples = self._samples.get(key)
+                if samples is not None and len(samples) >= min_samples:
+                    ordered = sorted(samples)
+                    break
+            else:
+                return None
+        rank = math.ceil(percentile / 100 * len(ordered)) - 1
+        return ordered[min(len(ordered) - 1, max(0, rank))]
+
+    def deadline(self, node_url: str, shape: str, config: dict[str, Any]) -> float | None:
+        """Seconds after which a shot on this node is hedged, or None when it should just run to timeout_seconds."""
+        if not config["hedge_shots"]:
+            return None
+        predicted = self.percentile(node_url, shape, float(config["hedge_percentile"]))
+        if predicted is None:
+            return None
+        deadline = max(float(config["hedge_min_seconds"]), predicted * float(config["hedge_multiplier"]))
+        return deadline if deadline < float(config["timeout_seconds"]) else None
+
+    def describe(self) -> list[dict[str, Any]]:
+        with self._lock:
+            snapshot = {key: sorted(samples) for key, samples in self._samples.items() if key[0] != self.ALL_NODES}
+        return [
+            {
+                "node": node_url,
+                "shape": shape,
+                "samples": len(ordered),
+                "p50_seconds": round(ordered[(len(ordered) - 1) // 2], 3),
+                "max_seconds": round(ordered[-1], 3),
+            }
+            for (node_url, shape), ordered in sorted(snapshot.items())
+        ]
+
+
+_shot_duration_stats: ShotDurationStats | None = None
+_shot_duration_stats_lock = threading.Lock()
+
+
+def get_shot_duration_stats() -> ShotDurationStats:
+    global _shot_duration_stats
+    with _shot_duration_stats_lock:
+        if _shot_duration_stats is None:
+            _shot_duration_stats = ShotDurationStats(
+                window=max(5, parse_int(os.getenv("RENDER_SHOT_STATS_WINDOW", 50), 50)),
+                min_samples=max(1, parse_int(os.getenv("RENDER_HEDGE_MIN_SAMPLES", 5), 5)),
+            )
+        return _shot_duration_stats
+
+
+class ShotAttempt:
+    """One dispatch of a shot's prompt to a node. cancel() withdraws the prompt once another attempt has won."""
+
+    def __init__(self, comfyui_url: str, hedge: bool = False, deadline: float | None = None) -> None:
+        self.comfyui_url = comfyui_url
+        self.hedge = hedge
+        self.deadline = deadline
+        self.abort = threading.Event()
+        self.prompt_id: str | None = None
+        self.prompt_seconds: float | None = None
+        self._lock = threading.Lock()
+
+    def queued(self, prompt_id: str) -> bool:
+        """Record the queued prompt; False if the attempt was cancelled first and the caller must withdraw it."""
+        with self._lock:
+            if self.abort.is_set():
+                return False
+            self.prompt_id = prompt_id
+            return True
+
+    def cancel(self) -> None:
+        """Abort the attempt now and withdraw its prompt from a background thread.
+
+        The losing node is usually the slow or wedged one, so the winner never waits on its HTTP calls.
+        """
+        with self._lock:
+            self.abort.set()
+            prompt_id = self.prompt_id
+        if prompt_id is not None:
+            threading.Thread(target=self._withdraw, args=(prompt_id,), name="render-hedge-cancel", daemon=True).start()
+
+    def _withdraw(self, prompt_id: str) -> None:
+        try:
+            cancel_comfy_prompts(self.comfyui_url, [prompt_id])
+        except Exception as err:
+            print(f"[render-server] could not cancel hedged prompt {prompt_id} on {self.comfyui_url}: {err}")
 
 
 def render_single_shot(
     comfyui_url: str,
-    workflow_template: dict[str, Any] | None,
+    workflow_template: CompiledWorkflow | None,
     checkpoint: str | None,
     output_dir: Path,
     index: int,
@@ -666,34 +2956,458 @@ def render_single_shot(
     seed: int,
     config: dict[str, Any],
     comfy_input_image: str | None = None,
-) -> Path:
+    on_progress: Callable[[float], None] | None = None,
+    lora_name: str | None = None,
+    attempt: ShotAttempt | None = None,
+) -> list[Path]:
+    """Render one shot as a single prompt and download every take (one per batch item)."""
     shot_prefix = f"{slugify('shot')}-{index + 1:03d}-{seed}"
+    if attempt is not None and attempt.hedge:
+        # Both attempts of a hedged shot download into the same output directory.
+        shot_prefix += "-hedge"
+    takes = int(config["takes_per_shot"])
+    workflow = build_shot_workflow(
+        workflow_template,
+        checkpoint,
+        shot_prefix,
+        positive_prompt,
+        negative_prompt,
+        seed,
+        config,
+        comfy_input_image=comfy_input_image,
+        batch_size=takes,
+        lora_name=lora_name,
+    )
 
-    if workflow_template is not None:
-        workflow = copy.deepcopy(workflow_template)
-        patch_workflow_common(workflow, positive_prompt, negative_prompt, seed, shot_prefix, config)
-        if comfy_input_image:
-            patch_workflow_reference_image(workflow, comfy_input_image, config)
-    else:
-        if not checkpoint:
-            raise RuntimeError(
-                "No checkpoint available. Set COMFYUI_CHECKPOINT or install a checkpoint model and restart ComfyUI."
+    job = _current_render_job.get()
+
+    def cancelled() -> bool:
+        return (job is not None and job.cancel_event.is_set()) or (attempt is not None and attempt.abort.is_set())
+
+    if cancelled():
+        raise RenderJobCancelled(f"shot {index + 1} cancelled")
+    stream = get_comfy_event_stream(comfyui_url)
+    client_id = stream.client_id if stream else f"studioai-{uuid.uuid4().hex[:10]}"
+    queued_at = time.monotonic()
+    with measure_stage("prompt_queue", comfyui_url, index):
+        prompt_id = queue_prompt(comfyui_url, workflow, client_id)
+    if (attempt is not None and not attempt.queued(prompt_id)) or (
+        job is not None and not job.track_prompt(prompt_id, comfyui_url)
+    ):
+        # Cancelled while the prompt was being queued, after the registry swept this node
+        # or after the other attempt of a hedged shot won.
+        cancel_comfy_prompts(comfyui_url, [prompt_id])
+        raise RenderJobCancelled(f"shot {index + 1} cancelled")
+    try:
+        with measure_stage("comfy_wait", comfyui_url, index):
+            history = wait_for_prompt_completion(
+                comfyui_url,
+                prompt_id,
+                timeout_seconds=int(config["timeout_seconds"]),
+                stream=stream,
+                on_progress=on_progress,
+                cancelled=cancelled,
             )
-        if comfy_input_image:
-            workflow = build_builtin_workflow_img2img(checkpoint, comfy_input_image, shot_prefix, config)
-        else:
-            workflow = build_builtin_workflow_text2img(checkpoint, shot_prefix, config)
-        patch_workflow_common(workflow, positive_prompt, negative_prompt, seed, shot_prefix, config)
-
-    client_id = f"studioai-{uuid.uuid4().hex[:10]}"
-    prompt_id = queue_prompt(comfyui_url, workflow, client_id)
-    history = wait_for_prompt_history(comfyui_url, prompt_id, timeout_seconds=int(config["timeout_seconds"]))
-    images = extract_output_images(history)
+    finally:
+        if job is not None:
+            job.untrack_prompt(prompt_id)
+    if attempt is not None:
+        attempt.prompt_seconds = time.monotonic() - queued_at
+    save_ids = [node_id for node_id, node in workflow.items() if isinstance(node, dict) and node.get("class_type") == "SaveImage"]
+    images = extract_output_images(history, save_ids)
     if not images:
         raise RuntimeError(f"ComfyUI produced no output images for prompt {prompt_id}")
 
-    output_path = output_dir / f"{shot_prefix}.png"
-    return download_comfy_image(comfyui_url, images[0], output_path)
+    with measure_stage("image_download", comfyui_url, index):
+        if takes == 1:
+            return [download_comfy_image(comfyui_url, images[0], output_dir / f"{shot_prefix}.png")]
+        return [
+            download_comfy_image(comfyui_url, image, output_dir / f"{shot_prefix}-take-{take}.png")
+            for take, image in enumerate(images[:takes], start=1)
+        ]
+
+
+class JobNodeAssets:
+    """Per-job record of what each ComfyUI node needs before a shot can run on it."""
+
+    def __init__(self, pool: ComfyNodePool, use_builtin_workflow: bool) -> None:
+        self.pool = pool
+        self.use_builtin_workflow = use_builtin_workflow
+        self._lock = threading.Lock()
+        self._checkpoints: dict[str, str] = {}
+
+    def checkpoint_for(self, node_url: str) -> str | None:
+        if not self.use_builtin_workflow:
+            return None
+        with self._lock:
+            if node_url in self._checkpoints:
+                return self._checkpoints[node_url]
+        node = self.pool.get_node(node_url)
+        checkpoint = fetch_default_checkpoint(node_url, node.checkpoints if node else None)
+        if checkpoint:
+            with self._lock:
+                self._checkpoints[node_url] = checkpoint
+        return checkpoint
+
+
+def ensure_reference_on_node(
+    pool: ComfyNodePool, node: ComfyNode, reference: CachedReference, index: int | None = None
+) -> str:
+    with pool.reference_upload_lock(node, reference.sha256):
+        comfy_name = pool.uploaded_reference(node, reference.sha256)
+        if comfy_name:
+            return comfy_name
+        if not reference.path.exists():
+            with measure_stage("reference_download", shot=index):
+                reference = get_reference_cache().fetch(reference.url)
+        with measure_stage("reference_upload", node.url, index):
+            comfy_name = upload_image_to_comfy(node.url, reference.path, upload_name=reference.comfy_name)
+        pool.record_reference_upload(node, reference.sha256, comfy_name)
+        return comfy_name
+
+
+def render_shot_on_pool(
+    pool: ComfyNodePool,
+    assets: JobNodeAssets,
+    workflow_template: CompiledWorkflow | None,
+    output_dir: Path,
+    index: int,
+    positive_prompt: str,
+    negative_prompt: str,
+    seed: int,
+    config: dict[str, Any],
+    reference: CachedReference | None = None,
+    on_progress: Callable[[float], None] | None = None,
+    lora_name: str | None = None,
+    models: str | None = None,
+) -> tuple[list[Path], str]:
+    stats = get_shot_duration_stats()
+    shape = describe_shot_shape(config, workflow_template, reference is not None, models)
+
+    def run_attempt(node: ComfyNode, attempt: ShotAttempt) -> list[Path]:
+        try:
+            takes = render_single_shot(
+                comfyui_url=node.url,
+                workflow_template=workflow_template,
+                checkpoint=assets.checkpoint_for(node.url),
+                output_dir=output_dir,
+                index=index,
+                positive_prompt=positive_prompt,
+                negative_prompt=negative_prompt,
+                seed=seed,
+                config=config,
+                comfy_input_image=ensure_reference_on_node(pool, node, reference, index) if reference else None,
+                on_progress=None if attempt.hedge else on_progress,
+                lora_name=lora_name,
+                attempt=attempt,
+            )
+        except BaseException:
+            # A failed or withdrawn prompt may have left the node with other models, or none.
+            pool.record_loaded_models(node, None)
+            raise
+        pool.record_loaded_models(node, models)
+        if attempt.prompt_seconds is not None:
+            # A straggler is recorded at its deadline: counting its full time would raise the
+            # percentile until stragglers stop being hedged, while a node that is uniformly
+            # slower still pushes the deadline up by hedge_multiplier per window.
+            seconds = attempt.prompt_seconds
+            stats.record(node.url, shape, min(seconds, attempt.deadline) if attempt.deadline else seconds)
+        return takes
+
+    tried: set[str] = set()
+    last_error: Exception | None = None
+    while True:
+        node = pool.acquire(exclude=tried, models=models)
+        if node is None:
+            detail = f": {last_error}" if last_error else ""
+            raise RuntimeError(f"No healthy ComfyUI node available for shot {index + 1}{detail}")
+        tried.add(node.url)
+        try:
+            # Hedging needs a second node: a duplicate on the same one would queue behind the straggler.
+            deadline = stats.deadline(node.url, shape, config) if len(pool.available_nodes()) > 1 else None
+            if deadline is None:
+                return run_attempt(node, ShotAttempt(node.url)), node.url
+            return run_hedged_shot(pool, node, run_attempt, deadline, index, models)
+        except Exception as err:
+            if not pool.is_node_failure(node, err):
+                raise
+            # The node went away mid-prompt: take it out of rotation and requeue the shot elsewhere.
+            pool.mark_failed(node, err)
+            last_error = err
+        finally:
+            pool.release(node)
+
+
+def run_hedged_shot(
+    pool: ComfyNodePool,
+    node: ComfyNode,
+    run_attempt: Callable[[ComfyNode, ShotAttempt], list[Path]],
+    deadline: float,
+    index: int,
+    models: str | None = None,
+) -> tuple[list[Path], str]:
+    """Run a shot on `node` and, if it overruns its predicted deadline, race a duplicate on another node.
+
+    A duplicate queued behind the straggler on the same node could never win, so when no other
+    node is available the shot simply keeps waiting. The first attempt to produce images wins and
+    the other one is aborted without waiting for it to wind down. If every attempt fails, the first
+    attempt's error is raised so node failover still applies.
+    """
+    metrics = get_metrics()
+    primary = ShotAttempt(node.url, deadline=deadline)
+    executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="render-hedge")
+    try:
+        futures: dict[Future, ShotAttempt] = {
+            executor.submit(contextvars.copy_context().run, run_attempt, node, primary): primary
+        }
+        done, _ = wait(futures, timeout=deadline)
+        if not done:
+            hedge_node = pool.acquire(exclude={node.url}, models=models)
+            if hedge_node is not None:
+                print(
+                    f"[render-server] shot {index + 1} overran its {deadline:.1f}s deadline on {node.url}; "
+                    f"hedging on {hedge_node.url}"
+                )
+                hedge = ShotAttempt(hedge_node.url, hedge=True)
+
+                def run_hedge() -> list[Path]:
+                    try:
+                        return run_attempt(hedge_node, hedge)
+                    finally:
+                        pool.release(hedge_node)
+
+                futures[executor.submit(contextvars.copy_context().run, run_hedge)] = hedge
+
+        errors: dict[ShotAttempt, BaseException] = {}
+        pending = set(futures)
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                attempt = futures[future]
+                error = future.exception()
+                if error is not None:
+                    errors[attempt] = error
+                    continue
+                for other in pending:
+                    futures[other].cancel()
+                if len(futures) > 1:
+                    metrics.inc("studioai_render_hedged_shots_total", node=node.url, winner="hedge" if attempt.hedge else "primary")
+                return future.result(), attempt.comfyui_url
+    finally:
+        # The aborted loser's prompt is withdrawn and its thread finishes (releasing its node) in the background.
+        executor.shutdown(wait=False)
+    if len(futures) > 1:
+        metrics.inc("studioai_render_hedged_shots_total", node=node.url, winner="none")
+    raise errors[primary]
+
+
+def render_shot_or_fallback(
+    pool: ComfyNodePool,
+    assets: JobNodeAssets,
+    workflow_template: CompiledWorkflow | None,
+    output_dir: Path,
+    index: int,
+    positive_prompt: str,
+    negative_prompt: str,
+    seed: int,
+    config: dict[str, Any],
+    reference: CachedReference | None = None,
+    on_progress: Callable[[float], None] | None = None,
+    lora_name: str | None = None,
+    models: str | None = None,
+) -> tuple[list[Path], str | None]:
+    try:
+        return render_shot_on_pool(
+            pool=pool,
+            assets=assets,
+            workflow_template=workflow_template,
+            output_dir=output_dir,
+            index=index,
+            positive_prompt=positive_prompt,
+            negative_prompt=negative_prompt,
+            seed=seed,
+            config=config,
+            reference=reference,
+            on_progress=on_progress,
+            lora_name=lora_name,
+            models=models,
+        )
+    except RenderJobCancelled:
+        raise
+    except Exception as shot_err:
+        if config["fail_on_shot_error"]:
+            raise RuntimeError(f"shot {index + 1} failed: {shot_err}") from shot_err
+        print(f"[render-server] shot {index + 1} fell back to a placeholder frame: {shot_err}")
+        with measure_stage("fallback_frame", shot=index):
+            fallback_path = render_fallback_frame(
+                output_dir / f"shot-{index + 1:03d}-fallback.png",
+                width=int(config["width"]),
+                height=int(config["height"]),
+            )
+        return [fallback_path], None
+
+
+def pick_shot_take(takes: list[Path], selected_take: int | None) -> Path:
+    # selected_take is 1-based; out-of-range selections fall back to the first take.
+    if selected_take and 1 <= selected_take <= len(takes):
+        return takes[selected_take - 1]
+    return takes[0]
+
+
+@dataclass(frozen=True)
+class PlannedShot:
+    """One storyboard shot with everything the render loop needs resolved up front."""
+
+    index: int
+    scene: int
+    shot_index: int
+    duration_sec: float
+    focus_character: str | None
+    positive_prompt: str
+    negative_prompt: str
+    seed: int
+    selected_take: int | None
+    lora_name: str | None
+    reference_url: str | None
+    reference_sha256: str | None
+    models: str | None
+    workflow_variant: str
+    cache_key: str | None
+
+    def describe(self) -> dict[str, Any]:
+        return {
+            "index": self.index,
+            "scene": self.scene,
+            "shot_index": self.shot_index,
+            "duration_sec": self.duration_sec,
+            "focus_character": self.focus_character,
+            "positive_prompt": self.positive_prompt,
+            "negative_prompt": self.negative_prompt,
+            "seed": self.seed,
+            "selected_take": self.selected_take,
+            "lora_name": self.lora_name,
+            "reference_url": self.reference_url,
+            "reference_sha256": self.reference_sha256,
+            "models": self.models,
+            "workflow_variant": self.workflow_variant,
+            "cache_key": self.cache_key,
+        }
+
+
+@dataclass(frozen=True)
+class RenderPlan:
+    """A RenderRequest compiled once: the resolved shots plus the references they share."""
+
+    episode_id: str
+    job_id: str
+    config: dict[str, Any]
+    workflow_template: CompiledWorkflow | None
+    checkpoint: str | None
+    shots: tuple[PlannedShot, ...]
+    references: dict[str, CachedReference]
+
+    def reference_for(self, shot: PlannedShot) -> CachedReference | None:
+        return self.references.get(shot.reference_url) if shot.reference_url else None
+
+
+def fetch_plan_reference(url: str, index: int) -> CachedReference | None:
+    with measure_stage("reference_download", shot=index):
+        return get_reference_cache().fetch(url)
+
+
+def compile_render_plan(
+    req: RenderRequest,
+    config: dict[str, Any],
+    workflow_template: CompiledWorkflow | None,
+    checkpoint: str | None,
+    fetch_reference: Callable[[str, int], CachedReference | None] = fetch_plan_reference,
+) -> RenderPlan:
+    """Resolve every shot's focus character, reference, prompts, seed, variant and cache key.
+
+    Each reference URL is fetched once, attributed to the first shot that uses it, and distinct
+    URLs are fetched concurrently (up to max_inflight_shots at a time). `fetch_reference` may
+    return None, in which case shots using that URL get no reference hash or cache key.
+    """
+    characters = CharacterIndex(req.characters)
+    takes_per_shot = int(config["takes_per_shot"])
+    prompts: list[tuple[int, ShotPayload, CharacterPayload | None, str, str, int, str | None]] = []
+    first_use: dict[str, int] = {}
+    for idx, shot in enumerate(req.storyboard or [ShotPayload()]):
+        focus_character = characters.focus_character(shot)
+        reference_url, reference_hint = characters.emotion_reference(focus_character, shot)
+        positive_prompt, negative_prompt, seed, reference_url = build_shot_prompt(
+            req,
+            shot,
+            req.characters,
+            focus_character,
+            config,
+            reference_url=reference_url,
+            reference_hint=reference_hint,
+        )
+        if reference_url:
+            first_use.setdefault(reference_url, idx)
+        prompts.append((idx, shot, focus_character, positive_prompt, negative_prompt, seed, reference_url))
+
+    references: dict[str, CachedReference] = {}
+    if first_use:
+        with ThreadPoolExecutor(
+            max_workers=min(len(first_use), int(config["max_inflight_shots"])), thread_name_prefix="render-plan-ref"
+        ) as executor:
+            fetches = {
+                url: executor.submit(contextvars.copy_context().run, fetch_reference, url, idx)
+                for url, idx in first_use.items()
+            }
+            for url, future in fetches.items():
+                reference = future.result()
+                if reference is not None:
+                    references[url] = reference
+
+    shots: list[PlannedShot] = []
+    for idx, shot, focus_character, positive_prompt, negative_prompt, seed, reference_url in prompts:
+        reference = references.get(reference_url) if reference_url else None
+        lora_name = (focus_character.lora_file if focus_character else "").strip() or None
+        models = describe_model_set(workflow_template, checkpoint, lora_name)
+        cache_key = None
+        if not (reference_url and reference is None):
+            cache_key = compute_keyframe_cache_key(
+                workflow_template,
+                checkpoint,
+                positive_prompt,
+                negative_prompt,
+                seed,
+                config,
+                reference_sha256=reference.sha256 if reference else None,
+                lora_name=lora_name,
+                batch_size=takes_per_shot,
+            )
+        shots.append(
+            PlannedShot(
+                index=idx,
+                scene=shot.scene,
+                shot_index=shot.shot_index,
+                duration_sec=max(1.0, float(shot.duration_sec or 4)),
+                focus_character=focus_character.name if focus_character else None,
+                positive_prompt=positive_prompt,
+                negative_prompt=negative_prompt,
+                seed=seed,
+                selected_take=shot.selected_take,
+                lora_name=lora_name,
+                reference_url=reference_url,
+                reference_sha256=reference.sha256 if reference else None,
+                models=models,
+                workflow_variant=describe_shot_shape(config, workflow_template, bool(reference_url), models),
+                cache_key=cache_key,
+            )
+        )
+    return RenderPlan(
+        episode_id=req.episode_id,
+        job_id=str(req.job_id),
+        config=config,
+        workflow_template=workflow_template,
+        checkpoint=checkpoint,
+        shots=tuple(shots),
+        references=references,
+    )
 
 
 def run_render_pipeline(req: RenderRequest) -> None:
@@ -710,7 +3424,23 @@ def run_render_pipeline(req: RenderRequest) -> None:
     music_enabled = parse_bool(production.get("music_generation_enabled"), parse_bool(req.audio.get("background_music_enabled"), True))
     sfx_enabled = parse_bool(production.get("sfx_enabled"), parse_bool(req.audio.get("sfx_enabled"), True))
     tts_enabled = parse_bool(req.audio.get("tts_enabled"), True)
-    comfyui_url, comfy_stats = resolve_comfyui_url()
+    job = get_job_registry().start(req)
+    timings = JobTimings(str(req.job_id), req.episode_id)
+    job.timings = timings
+    _current_render_job.set(job)
+    _current_job_timings.set(timings)
+    metrics = get_metrics()
+    if job.cancel_event.is_set():
+        send_callback(
+            callback_base,
+            callback_key,
+            "/failed",
+            {"episode_id": req.episode_id, "job_id": req.job_id, "error_message": "Render job cancelled"},
+        )
+        metrics.inc("studioai_render_jobs_total", status="cancelled")
+        return
+    comfy_pool = get_comfy_pool()
+    primary_node = comfy_pool.primary_node()
 
     send_callback(
         callback_base,
@@ -724,7 +3454,12 @@ def run_render_pipeline(req: RenderRequest) -> None:
         },
     )
 
-    if not comfyui_url:
+    if not primary_node:
+        unreachable = (
+            "any node in COMFYUI_URLS"
+            if get_comfyui_pool_urls()
+            else "COMFYUI_URL, 127.0.0.1:8000, or 127.0.0.1:8188"
+        )
         send_callback(
             callback_base,
             callback_key,
@@ -732,11 +3467,14 @@ def run_render_pipeline(req: RenderRequest) -> None:
             {
                 "episode_id": req.episode_id,
                 "job_id": req.job_id,
-                "error_message": "ComfyUI is not reachable on COMFYUI_URL, 127.0.0.1:8000, or 127.0.0.1:8188.",
+                "error_message": f"ComfyUI is not reachable on {unreachable}.",
             },
         )
+        metrics.inc("studioai_render_jobs_total", status="failed")
         return
 
+    comfyui_url = primary_node.url
+    comfy_stats = primary_node.stats
     comfy_version = comfy_stats.get("system", {}).get("comfyui_version", "unknown") if comfy_stats else "unknown"
     send_callback(
         callback_base,
@@ -750,74 +3488,104 @@ def run_render_pipeline(req: RenderRequest) -> None:
         },
     )
 
-    episode_dir = Path(tempfile.gettempdir()) / "studioai-renders" / req.episode_id / str(req.job_id)
+    workspace = get_workspace_manager()
+    episode_dir = workspace.create(req.episode_id, str(req.job_id))
     frames_dir = episode_dir / "frames"
-    refs_dir = episode_dir / "refs"
-    episode_dir.mkdir(parents=True, exist_ok=True)
     frames_dir.mkdir(parents=True, exist_ok=True)
-    refs_dir.mkdir(parents=True, exist_ok=True)
+    assembler: SegmentedVideoAssembler | None = None
+    succeeded = False
+    manifest = JobManifest.start(episode_dir, req)
 
     try:
-        workflow_template = load_workflow_template()
-        checkpoint = fetch_default_checkpoint(comfyui_url) if workflow_template is None else None
+        with measure_stage("discovery", comfyui_url):
+            workflow_template = load_workflow_template()
+            node_assets = JobNodeAssets(comfy_pool, use_builtin_workflow=workflow_template is None)
+            checkpoint = node_assets.checkpoint_for(comfyui_url)
         if workflow_template is None and not checkpoint:
             raise RuntimeError(
                 "No checkpoint detected. Set COMFYUI_CHECKPOINT or set COMFYUI_WORKFLOW_PATH to an exported workflow JSON."
             )
-        primary_character = pick_primary_character(req.characters)
+        plan = compile_render_plan(req, render_config, workflow_template, checkpoint)
 
         storyboard = req.storyboard or [ShotPayload()]
-        keyframes: list[tuple[Path, float]] = []
-        reference_upload_cache: dict[str, str] = {}
-        reference_download_cache: dict[str, Path] = {}
-
-        for idx, shot in enumerate(storyboard):
-            focus_character = get_focus_character(shot, req.characters, primary_character)
-            reference_url, reference_hint = pick_emotion_reference(focus_character, shot)
-            positive_prompt, negative_prompt, seed, reference_url = build_shot_prompt(
-                req,
-                shot,
-                req.characters,
-                focus_character,
-                render_config,
-                reference_url=reference_url,
-                reference_hint=reference_hint,
-            )
-
-            comfy_input_name: str | None = None
-            if reference_url:
-                if reference_url not in reference_upload_cache:
-                    downloaded_path = reference_download_cache.get(reference_url)
-                    if downloaded_path is None:
-                        downloaded_path = download_reference_image(reference_url, refs_dir)
-                        reference_download_cache[reference_url] = downloaded_path
-                    reference_upload_cache[reference_url] = upload_image_to_comfy(comfyui_url, downloaded_path)
-                comfy_input_name = reference_upload_cache[reference_url]
-
-            try:
-                frame_path = render_single_shot(
-                    comfyui_url=comfyui_url,
-                    workflow_template=workflow_template,
-                    checkpoint=checkpoint,
-                    output_dir=frames_dir,
-                    index=idx,
-                    positive_prompt=positive_prompt,
-                    negative_prompt=negative_prompt,
-                    seed=seed,
-                    config=render_config,
-                    comfy_input_image=comfy_input_name,
+        shot_frames: list[Path | None] = [None] * len(storyboard)
+        takes_per_shot = int(render_config["takes_per_shot"])
+        shot_takes: dict[int, list[Path]] = {}
+        shot_nodes: dict[str, int] = {}
+        # Multi-take shots always render so directors get every take to choose from.
+        keyframe_cache = get_keyframe_cache() if render_config["keyframe_cache"] and takes_per_shot == 1 else None
+        shot_input_hashes: dict[int, str] = {}
+        cache_hits = 0
+        # Frames from an earlier run of this job, or with `resume` from any earlier job of the episode.
+        resumable: dict[str, list[Path]] = {}
+        for previous in ([manifest] + (workspace.manifests(req.episode_id) if req.resume else [])):
+            for inputs_hash, takes in previous.rendered_takes().items():
+                resumable.setdefault(inputs_hash, takes)
+            if previous is not manifest and previous.job_dir != episode_dir and previous.status == "running":
+                # This job takes over; do not pick the old one up again on the next startup.
+                previous.finish("superseded")
+        resumed_count = 0
+        max_inflight = int(render_config["max_inflight_shots"])
+        inflight: dict[Future, int] = {}
+        shot_fractions: dict[int, float] = {}
+        rendered_count = 0
+        last_progress_percent = 12
+        frame_width = int(render_config["width"])
+        frame_height = int(render_config["height"])
+        shot_durations = [planned.duration_sec for planned in plan.shots]
+
+        intro_frame: Path | None = None
+        outro_frame: Path | None = None
+        if intro_enabled:
+            with measure_stage("title_frame"):
+                intro_frame = render_title_frame(
+                    frames_dir / "intro-title.png", width=frame_width, height=frame_height, text=intro_text
                 )
-            except Exception as shot_err:
-                if render_config["fail_on_shot_error"]:
-                    raise RuntimeError(f"shot {idx + 1} failed: {shot_err}") from shot_err
-                frame_path = render_fallback_frame(
-                    frames_dir / f"shot-{idx + 1:03d}-fallback.png",
-                    width=int(render_config["width"]),
-                    height=int(render_config["height"]),
+        if outro_enabled:
+            with measure_stage("title_frame"):
+                outro_frame = render_title_frame(
+                    frames_dir / "outro-title.png", width=frame_width, height=frame_height, text=outro_text
+                )
+
+        # Segmented assembly encodes each scene (or every segment_shots shots) as soon as its
+        # shots are done, so only a stream-copy concat is left once the last shot lands.
+        segment_groups: list[list[int]] = []
+        if render_config["assembly_mode"] == "segmented" and shutil.which(get_ffmpeg_path()):
+            assembler = SegmentedVideoAssembler(
+                episode_dir / "segments",
+                int(render_config["fps"]),
+                frame_width,
+                frame_height,
+                str(render_config["encoder_profile"]),
+            )
+            segment_groups = group_shots_into_segments(storyboard, int(render_config["segment_shots"]))
+            if intro_frame:
+                assembler.submit(0, [(intro_frame, intro_duration_sec)])
+            if outro_frame:
+                assembler.submit(len(segment_groups) + 1, [(outro_frame, outro_duration_sec)])
+        shot_segments = {idx: position for position, group in enumerate(segment_groups) for idx in group}
+        segment_pending = [len(group) for group in segment_groups]
+
+        def mark_shot_finished(shot_idx: int) -> None:
+            if assembler is None:
+                return
+            position = shot_segments[shot_idx]
+            segment_pending[position] -= 1
+            if segment_pending[position] == 0:
+                assembler.submit(
+                    position + 1,
+                    [(shot_frames[i], shot_durations[i]) for i in segment_groups[position] if shot_frames[i] is not None],
                 )
 
-            keyframes.append((frame_path, max(1.0, float(shot.duration_sec or 4))))
-            progress = 12 + int(((idx + 1) / max(1, len(storyboard))) * 63)
+        def report_render_progress(current_step: str, force: bool) -> None:
+            nonlocal last_progress_percent
+            job.shots_done = rendered_count
+            job.shots_in_flight = sorted(i + 1 for i in inflight.values())
+            completed = rendered_count + sum(shot_fractions.get(i, 0.0) for i in inflight.values())
+            percent = min(75, 12 + int((completed / max(1, len(storyboard))) * 63))
+            if not force and percent <= last_progress_percent:
+                return
+            last_progress_percent = max(last_progress_percent, percent)
             send_callback(
                 callback_base,
                 callback_key,
@@ -825,27 +3593,121 @@ def run_render_pipeline(req: RenderRequest) -> None:
                 {
                     "episode_id": req.episode_id,
                     "job_id": req.job_id,
-                    "progress_percent": min(75, progress),
-                    "current_step": f"rendered_shot_{idx + 1}_of_{len(storyboard)}",
+                    "progress_percent": last_progress_percent,
+                    "current_step": current_step,
                 },
             )
 
-        if intro_enabled:
-            intro_frame = render_title_frame(
-                frames_dir / "intro-title.png",
-                width=int(render_config["width"]),
-                height=int(render_config["height"]),
-                text=intro_text,
-            )
+        def track_shot_progress(shot_idx: int) -> Callable[[float], None]:
+            # Called from the ComfyUI event stream thread, so only record the fraction here;
+            # callbacks are sent from the pipeline thread in drain_inflight.
+            def on_progress(fraction: float) -> None:
+                shot_fractions[shot_idx] = fraction
+
+            return on_progress
+
+        def drain_inflight(limit: int) -> None:
+            # Collect finished shots until at most `limit` prompts remain in flight on ComfyUI.
+            nonlocal rendered_count
+            while len(inflight) > limit:
+                done, _ = wait(list(inflight), timeout=2.0, return_when=FIRST_COMPLETED)
+                if not done:
+                    if job.cancel_event.is_set():
+                        raise RenderJobCancelled("Render job cancelled")
+                    report_render_progress(f"rendering_shot_{rendered_count + 1}_of_{len(storyboard)}", force=False)
+                    continue
+                for future in sorted(done, key=lambda f: inflight[f]):
+                    shot_idx = inflight.pop(future)
+                    takes, node_url = future.result()
+                    shot_takes[shot_idx] = takes
+                    shot_frames[shot_idx] = pick_shot_take(takes, plan.shots[shot_idx].selected_take)
+                    inputs_hash = shot_input_hashes.get(shot_idx)
+                    manifest.record_shot(shot_idx, inputs_hash, takes, "rendered" if node_url else "fallback")
+                    metrics.inc("studioai_render_shots_total", node=node_url or "", outcome="rendered" if node_url else "fallback")
+                    if not node_url:
+                        metrics.inc("studioai_render_fallback_frames_total")
+                    if node_url:
+                        shot_nodes[node_url] = shot_nodes.get(node_url, 0) + 1
+                        # Only cache frames rendered with the checkpoint the key was computed for.
+                        if keyframe_cache and inputs_hash and node_assets.checkpoint_for(node_url) == checkpoint:
+                            keyframe_cache.put(inputs_hash, shot_frames[shot_idx])
+                    shot_fractions.pop(shot_idx, None)
+                    rendered_count += 1
+                    mark_shot_finished(shot_idx)
+                    report_render_progress(f"rendered_shot_{rendered_count}_of_{len(storyboard)}", force=True)
+
+        shot_executor = ThreadPoolExecutor(max_workers=max_inflight, thread_name_prefix="render-shot")
+        try:
+            for planned in plan.shots:
+                idx = planned.index
+                drain_inflight(max_inflight - 1)
+                if job.cancel_event.is_set():
+                    raise RenderJobCancelled("Render job cancelled")
+                inputs_hash = planned.cache_key
+                resumed_takes = resumable.get(inputs_hash) if inputs_hash else None
+                if resumed_takes:
+                    takes = [
+                        take if take.parent == frames_dir else Path(shutil.copy2(take, frames_dir / take.name))
+                        for take in resumed_takes
+                    ]
+                    shot_takes[idx] = takes
+                    shot_frames[idx] = pick_shot_take(takes, planned.selected_take)
+                    manifest.record_shot(idx, inputs_hash, takes, "rendered")
+                    metrics.inc("studioai_render_shots_total", node="", outcome="resumed")
+                    resumed_count += 1
+                    rendered_count += 1
+                    mark_shot_finished(idx)
+                    report_render_progress(f"resumed_shot_{idx + 1}_of_{len(storyboard)}", force=True)
+                    continue
+
+                if keyframe_cache and inputs_hash:
+                    cached_frame = keyframe_cache.get(
+                        inputs_hash, frames_dir / f"shot-{idx + 1:03d}-{planned.seed}-cached.png"
+                    )
+                    if cached_frame:
+                        shot_frames[idx] = cached_frame
+                        manifest.record_shot(idx, inputs_hash, [cached_frame], "rendered")
+                        metrics.inc("studioai_render_shots_total", node="", outcome="cached")
+                        cache_hits += 1
+                        rendered_count += 1
+                        mark_shot_finished(idx)
+                        report_render_progress(f"cached_shot_{idx + 1}_of_{len(storyboard)}", force=True)
+                        continue
+                if inputs_hash:
+                    shot_input_hashes[idx] = inputs_hash
+
+                future = shot_executor.submit(
+                    contextvars.copy_context().run,
+                    render_shot_or_fallback,
+                    pool=comfy_pool,
+                    assets=node_assets,
+                    workflow_template=workflow_template,
+                    output_dir=frames_dir,
+                    index=idx,
+                    positive_prompt=planned.positive_prompt,
+                    negative_prompt=planned.negative_prompt,
+                    seed=planned.seed,
+                    config=render_config,
+                    reference=plan.reference_for(planned),
+                    on_progress=track_shot_progress(idx),
+                    lora_name=planned.lora_name,
+                    models=planned.models,
+                )
+                inflight[future] = idx
+            drain_inflight(0)
+        finally:
+            shot_executor.shutdown(wait=True, cancel_futures=True)
+        if job.cancel_event.is_set():
+            raise RenderJobCancelled("Render job cancelled")
+
+        keyframes: list[tuple[Path, float]] = [
+            (frame_path, duration)
+            for frame_path, duration in zip(shot_frames, shot_durations)
+            if frame_path is not None
+        ]
+        if intro_frame:
             keyframes.insert(0, (intro_frame, intro_duration_sec))
-
-        if outro_enabled:
-            outro_frame = render_title_frame(
-                frames_dir / "outro-title.png",
-                width=int(render_config["width"]),
-                height=int(render_config["height"]),
-                text=outro_text,
-            )
+        if outro_frame:
             keyframes.append((outro_frame, outro_duration_sec))
 
         if tts_enabled:
@@ -900,15 +3762,40 @@ def run_render_pipeline(req: RenderRequest) -> None:
         )
 
         output_file = episode_dir / f"{req.episode_id}-{uuid.uuid4().hex[:8]}.mp4"
-        build_video_from_keyframes(
-            keyframes=keyframes,
-            output_path=output_file,
-            fps=int(render_config["fps"]),
-            width=int(render_config["width"]),
-            height=int(render_config["height"]),
-            require_ffmpeg=bool(render_config["require_ffmpeg"]),
-        )
+        if assembler is not None:
+            assembler.finish(output_file)
+        else:
+            build_video_from_keyframes(
+                keyframes=keyframes,
+                output_path=output_file,
+                fps=int(render_config["fps"]),
+                width=frame_width,
+                height=frame_height,
+                require_ffmpeg=bool(render_config["require_ffmpeg"]),
+                encoder_profile=str(render_config["encoder_profile"]),
+            )
         duration_seconds = max(8, int(sum(duration for _, duration in keyframes) or 8))
+        artifact_store = get_artifact_store()
+        artifact_key = f"{req.episode_id}/{req.job_id}/{output_file.name}"
+        with measure_stage("artifact_upload"):
+            artifact_store.put(output_file, artifact_key, "video/mp4")
+        workspace_bytes = directory_size(episode_dir)
+        take_reports: list[dict[str, Any]] = []
+        if takes_per_shot > 1:
+            for shot_idx, takes in sorted(shot_takes.items()):
+                take_urls: list[str] = []
+                for take_path in takes:
+                    take_key = f"{req.episode_id}/{req.job_id}/takes/{take_path.name}"
+                    with measure_stage("artifact_upload"):
+                        artifact_store.put(take_path, take_key, "image/png")
+                    take_urls.append(artifact_url(take_key))
+                take_reports.append(
+                    {
+                        "shot": shot_idx + 1,
+                        "selected_take": takes.index(shot_frames[shot_idx]) + 1,
+                        "take_urls": take_urls,
+                    }
+                )
 
         send_callback(
             callback_base,
@@ -917,22 +3804,40 @@ def run_render_pipeline(req: RenderRequest) -> None:
             {
                 "episode_id": req.episode_id,
                 "job_id": req.job_id,
-                "output_url": str(output_file),
+                "output_url": artifact_url(artifact_key),
                 "duration_seconds": duration_seconds,
                 "metadata": {
                     "mode": "storyboard_keyframes",
                     "shot_count": len(keyframes),
                     "comfyui_url": comfyui_url,
+                    "comfyui_nodes": shot_nodes,
+                    "keyframe_cache_hits": cache_hits,
+                    "resumed_shots": resumed_count,
+                    "assembly_mode": "segmented" if assembler is not None else "single",
+                    "encoder_profile": render_config["encoder_profile"],
+                    "artifact_store": artifact_store.backend,
+                    "artifact_key": artifact_key,
+                    "workspace_bytes": workspace_bytes,
+                    "takes_per_shot": takes_per_shot,
+                    "takes": take_reports,
                     "intro_enabled": intro_enabled,
                     "outro_enabled": outro_enabled,
                     "tts_enabled": tts_enabled,
                     "music_enabled": music_enabled,
                     "sfx_enabled": sfx_enabled,
                     "voice_cast_count": len([c for c in req.characters if c.voice_assignment and c.voice_assignment.voice_actor_id]),
+                    "timings": timings.summary(),
                 },
             },
         )
+        succeeded = True
+        manifest.finish("completed")
+        metrics.inc("studioai_render_jobs_total", status="completed")
     except Exception as err:
+        status = "cancelled" if job.cancel_event.is_set() else "failed"
+        # A cancelled job must not be picked up again by resume_interrupted_jobs.
+        manifest.finish(status)
+        metrics.inc("studioai_render_jobs_total", status=status)
         send_callback(
             callback_base,
             callback_key,
@@ -940,58 +3845,895 @@ def run_render_pipeline(req: RenderRequest) -> None:
             {
                 "episode_id": req.episode_id,
                 "job_id": req.job_id,
-                "error_message": str(err),
+                "error_message": "Render job cancelled" if status == "cancelled" else str(err),
             },
         )
+    finally:
+        if assembler is not None:
+            assembler.close()
+        workspace.finish(episode_dir, succeeded)
+
+
+JOB_PRIORITIES = {"high": 0, "normal": 1, "low": 2}
+
+
+def parse_job_priority(value: Any) -> int:
+    if isinstance(value, str) and value.strip().lower() in JOB_PRIORITIES:
+        return JOB_PRIORITIES[value.strip().lower()]
+    return min(max(JOB_PRIORITIES.values()), max(0, parse_int(value, JOB_PRIORITIES["normal"])))
+
+
+class SchedulerQueueFull(RuntimeError):
+    def __init__(self, retry_after_seconds: int) -> None:
+        super().__init__("Render queue is full")
+        self.retry_after_seconds = retry_after_seconds
+
+
+class RenderJobScheduler:
+    """Bounded in-process scheduler for render pipelines.
+
+    Pending jobs are grouped by priority and then by fairness key (workspace, falling back to
+    episode). Within a priority level the keys are served round-robin, so a burst from one
+    workspace cannot starve the others.
+    """
+
+    def __init__(self, max_concurrent: int, max_pending: int, runner: Callable[[RenderRequest], None]) -> None:
+        self.max_concurrent = max_concurrent
+        self.max_pending = max_pending
+        self._runner = runner
+        self._cond = threading.Condition()
+        self._pending: dict[int, OrderedDict[str, deque[RenderRequest]]] = {}
+        self._pending_count = 0
+        self._running = 0
+        self._durations: deque[float] = deque(maxlen=20)
+        self._workers: list[threading.Thread] = []
+
+    def submit(self, req: RenderRequest, priority: int, fairness_key: str) -> int:
+        with self._cond:
+            # A job an idle worker will pick up straight away never waits, so it is accepted even
+            # at the cap (RENDER_MAX_PENDING_JOBS=0 means: no waiting queue at all).
+            idle_workers = self.max_concurrent - self._running - self._pending_count
+            if self._pending_count >= self.max_pending and idle_workers <= 0:
+                raise SchedulerQueueFull(self._retry_after_locked())
+            queues = self._pending.setdefault(priority, OrderedDict())
+            queues.setdefault(fairness_key, deque()).append(req)
+            self._pending_count += 1
+            self._ensure_workers_locked()
+            self._cond.notify()
+            return self._pending_count
+
+    def remove(self, job_id: str) -> RenderRequest | None:
+        """Take a job that has not started yet out of the queue."""
+        with self._cond:
+            for priority, queues in list(self._pending.items()):
+                for key, queue in list(queues.items()):
+                    req = next((item for item in queue if str(item.job_id) == job_id), None)
+                    if req is None:
+                        continue
+                    queue.remove(req)
+                    self._pending_count -= 1
+                    if not queue:
+                        del queues[key]
+                    if not queues:
+                        del self._pending[priority]
+                    return req
+        return None
+
+    def stats(self) -> dict[str, Any]:
+        with self._cond:
+            return {
+                "running": self._running,
+                "pending": self._pending_count,
+                "max_concurrent": self.max_concurrent,
+                "max_pending": self.max_pending,
+            }
+
+    def _retry_after_locked(self) -> int:
+        if not self._durations:
+            return 30
+        average = sum(self._durations) / len(self._durations)
+        return int(min(600, max(5, math.ceil(average / max(1, self.max_concurrent)))))
+
+    def _ensure_workers_locked(self) -> None:
+        self._workers = [worker for worker in self._workers if worker.is_alive()]
+        while len(self._workers) < self.max_concurrent:
+            worker = threading.Thread(target=self._work, name=f"render-job-{len(self._workers)}", daemon=True)
+            worker.start()
+            self._workers.append(worker)
+
+    def _next_locked(self) -> RenderRequest | None:
+        for priority in sorted(self._pending):
+            queues = self._pending[priority]
+            key, queue = next(iter(queues.items()))
+            req = queue.popleft()
+            if queue:
+                queues.move_to_end(key)
+            else:
+                del queues[key]
+            if not queues:
+                del self._pending[priority]
+            return req
+        return None
+
+    def _work(self) -> None:
+        while True:
+            with self._cond:
+                req = self._next_locked()
+                while req is None:
+                    self._cond.wait()
+                    req = self._next_locked()
+                self._pending_count -= 1
+                self._running += 1
+            started = time.time()
+            try:
+                # A fresh context per job so per-job state (see _current_job_timings) never leaks to the next one.
+                contextvars.Context().run(self._runner, req)
+            except Exception as err:
+                print(f"[render-server] job {req.job_id} crashed: {err}")
+            finally:
+                with self._cond:
+                    self._running -= 1
+                    self._durations.append(time.time() - started)
+
+
+_job_scheduler: RenderJobScheduler | None = None
+_job_scheduler_lock = threading.Lock()
+
+
+def get_job_scheduler() -> RenderJobScheduler:
+    global _job_scheduler
+    with _job_scheduler_lock:
+        if _job_scheduler is None:
+            _job_scheduler = RenderJobScheduler(
+                max_concurrent=max(1, parse_int(os.getenv("RENDER_MAX_CONCURRENT_JOBS", 2), 2)),
+                max_pending=max(0, parse_int(os.getenv("RENDER_MAX_PENDING_JOBS", 50), 50)),
+                runner=run_render_pipeline,
+            )
+        return _job_scheduler
+
+
+JOB_TERMINAL_STATES = {"completed", "failed", "cancelled", "interrupted"}
+# A job in one of these states still has a pipeline (or a queue slot) working on its workspace.
+JOB_ACTIVE_STATES = {"queued", "running", "cancelling"}
+# Fields that only say who to notify or how to schedule; two requests differing only in these render the same episode.
+REQUEST_FINGERPRINT_EXCLUDE = {"job_id", "callback_url", "callback_key", "priority", "workspace_id", "resume"}
+
+
+def compute_request_fingerprint(req: RenderRequest) -> str:
+    canonical = json.dumps(
+        req.model_dump(mode="json", exclude=REQUEST_FINGERPRINT_EXCLUDE), sort_keys=True, separators=(",", ":")
+    )
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+class JobAlreadyActive(RuntimeError):
+    def __init__(self, job: "RenderJob") -> None:
+        super().__init__(f"Job {job.job_id} is still queued or running")
+        self.job = job
+
+
+class RenderJob:
+    """Live state of one submitted render job, as reported by GET /jobs/{job_id}."""
+
+    def __init__(self, req: RenderRequest | None, job_id: str, episode_id: str) -> None:
+        self.request = req
+        self.job_id = job_id
+        self.episode_id = episode_id
+        self.fingerprint = compute_request_fingerprint(req) if req else ""
+        # Set on a duplicate submission that shares the render of an identical in-flight job.
+        self.coalesced_with: str | None = None
+        self.attached: list[RenderJob] = []
+        # Set when the submitter cancelled this job while duplicates were attached: it is reported
+        # cancelled, but its pipeline keeps rendering for them.
+        self.detached_render = False
+        self.workspace_id = (req.workspace_id or req.episode_id) if req else ""
+        self.priority = req.priority if req else "normal"
+        self.shot_count = len(req.storyboard) if req else 0
+        self.state = "queued"
+        self.submitted_at = time.time()
+        self.started_at: float | None = None
+        self.finished_at: float | None = None
+        self.progress_percent = 0
+        self.current_step = "queued"
+        self.shots_done = 0
+        self.shots_in_flight: list[int] = []
+        self.output_url: str | None = None
+        self.error = ""
+        self.cancel_event = threading.Event()
+        self.timings: JobTimings | None = None
+        self._lock = threading.Lock()
+        self._prompts: dict[str, str] = {}
+
+    @classmethod
+    def restore(cls, data: dict[str, Any]) -> "RenderJob":
+        job = cls(None, str(data.get("job_id") or ""), str(data.get("episode_id") or ""))
+        for field in (
+            "workspace_id",
+            "priority",
+            "shot_count",
+            "state",
+            "submitted_at",
+            "started_at",
+            "finished_at",
+            "progress_percent",
+            "current_step",
+            "shots_done",
+            "output_url",
+            "error",
+            "coalesced_with",
+        ):
+            if field in data:
+                setattr(job, field, data[field])
+        if job.state not in JOB_TERMINAL_STATES:
+            # The process that ran it is gone; resume_interrupted_jobs resubmits it if its manifest allows.
+            job.state = "interrupted"
+        return job
+
+    def request_cancel(self) -> None:
+        # Under the prompt lock so a prompt is either tracked (and swept by the canceller) or refused.
+        with self._lock:
+            self.cancel_event.set()
+
+    def track_prompt(self, prompt_id: str, comfyui_url: str) -> bool:
+        with self._lock:
+            if self.cancel_event.is_set():
+                return False
+            self._prompts[prompt_id] = comfyui_url
+            return True
+
+    def untrack_prompt(self, prompt_id: str) -> None:
+        with self._lock:
+            self._prompts.pop(prompt_id, None)
+
+    def prompts_by_node(self) -> dict[str, list[str]]:
+        with self._lock:
+            grouped: dict[str, list[str]] = {}
+            for prompt_id, comfyui_url in self._prompts.items():
+                grouped.setdefault(comfyui_url, []).append(prompt_id)
+            return grouped
+
+    def describe(self) -> dict[str, Any]:
+        now = time.time()
+        with self._lock:
+            prompts_in_flight = len(self._prompts)
+        return {
+            "job_id": self.job_id,
+            "episode_id": self.episode_id,
+            "workspace_id": self.workspace_id,
+            "priority": self.priority,
+            "state": self.state,
+            "progress_percent": self.progress_percent,
+            "current_step": self.current_step,
+            "shot_count": self.shot_count,
+            "shots_done": self.shots_done,
+            "shots_in_flight": self.shots_in_flight,
+            "prompts_in_flight": prompts_in_flight,
+            "submitted_at": self.submitted_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+            "queued_seconds": round((self.started_at or self.finished_at or now) - self.submitted_at, 3),
+            "elapsed_seconds": round((self.finished_at or now) - self.started_at, 3) if self.started_at else None,
+            "output_url": self.output_url,
+            "error": self.error,
+            "coalesced_with": self.coalesced_with,
+            "attached_jobs": [job.job_id for job in self.attached],
+            "timings": self.timings.summary() if self.timings else None,
+        }
+
+
+class RenderJobRegistry:
+    """Submitted render jobs by job_id, oldest first.
+
+    State follows the callbacks the pipeline sends (see send_callback), so GET /jobs always
+    agrees with what the API was told. Finished jobs beyond max_finished are forgotten; with
+    a state_path the registry is mirrored to JSON so history survives a restart.
+    """
+
+    def __init__(self, max_finished: int, state_path: Path | None) -> None:
+        self.max_finished = max_finished
+        self.state_path = state_path
+        self._lock = threading.Lock()
+        self._jobs: OrderedDict[str, RenderJob] = OrderedDict()
+        self._load()
+
+    def register(self, req: RenderRequest, coalesce: bool = False) -> tuple[RenderJob, RenderJob | None]:
+        """Record a submission; with coalesce, attach it to an identical queued or running job if there is one.
+
+        Returns the job and, when it was coalesced, the in-flight job whose render it shares. Raises
+        JobAlreadyActive when the job_id belongs to a job that is still queued or running and the
+        submission is not a retry of it, so its record and pipeline are never replaced.
+        """
+        job = RenderJob(req, str(req.job_id), req.episode_id)
+        with self._lock:
+            primary = None
+            if coalesce:
+                primary = next(
+                    (
+                        other
+                        for other in self._jobs.values()
+                        if other.fingerprint == job.fingerprint
+                        and other.coalesced_with is None
+                        and other.state in {"queued", "running"}
+                    ),
+                    None,
+                )
+            existing = self._jobs.get(job.job_id)
+            if primary is not None and (
+                existing is primary or (existing is not None and existing.coalesced_with == primary.job_id)
+            ):
+                # A retry of a submission that is already attached: nothing new to notify.
+                return existing, primary
+            if existing is not None and (existing.state in JOB_ACTIVE_STATES or existing.detached_render):
+                raise JobAlreadyActive(existing)
+            if primary is not None:
+                job.coalesced_with = primary.job_id
+                job.state = primary.state
+                job.started_at = primary.started_at
+                job.progress_percent = primary.progress_percent
+                job.current_step = primary.current_step
+                job.timings = primary.timings
+                primary.attached.append(job)
+            self._jobs.pop(job.job_id, None)
+            self._jobs[job.job_id] = job
+            self._evict_locked()
+        self.save()
+        return job, primary
+
+    def discard(self, job_id: str) -> None:
+        with self._lock:
+            self._jobs.pop(job_id, None)
+        self.save()
+
+    def start(self, req: RenderRequest) -> RenderJob:
+        with self._lock:
+            job = self._jobs.get(str(req.job_id))
+        if job is None or job.request is not req:
+            # Pipelines started without submit_render_job (scripts, tests) still get a record.
+            job, _ = self.register(req)
+        for record in job.attached if job.detached_render else [job, *job.attached]:
+            record.state = "cancelling" if job.cancel_event.is_set() else "running"
+            record.started_at = time.time()
+            record.current_step = "started"
+        self.save()
+        return job
+
+    def get(self, job_id: str) -> RenderJob | None:
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def describe(self, state: str | None = None) -> list[dict[str, Any]]:
+        with self._lock:
+            jobs = list(self._jobs.values())
+        return [job.describe() for job in jobs if state is None or job.state == state]
+
+    def observe_callback(self, route: str, payload: dict[str, Any]) -> list[RenderJob]:
+        """Apply a callback to the job and its attached duplicates; returns the duplicates to notify too."""
+        job = self.get(str(payload.get("job_id") or ""))
+        if job is None or (job.state in JOB_TERMINAL_STATES and not job.detached_render):
+            return []
+        attached = [other for other in job.attached if other.state not in JOB_TERMINAL_STATES]
+        for record in attached if job.detached_render else [job, *attached]:
+            if route == "/progress":
+                record.progress_percent = parse_int(payload.get("progress_percent"), record.progress_percent)
+                record.current_step = str(payload.get("current_step") or record.current_step)
+                record.shots_done = job.shots_done
+                continue
+            record.finished_at = time.time()
+            record.shots_in_flight = []
+            if route == "/complete":
+                record.state = "completed"
+                record.progress_percent = 100
+                record.current_step = "completed"
+                record.output_url = payload.get("output_url")
+            else:
+                record.state = "cancelled" if job.cancel_event.is_set() else "failed"
+                record.current_step = record.state
+                record.error = str(payload.get("error_message") or "")
+        if route != "/progress":
+            job.detached_render = False
+            with self._lock:
+                self._evict_locked()
+            self.save()
+        return attached
+
+    def cancel(self, job: RenderJob) -> None:
+        """Stop a job: drop it from the scheduler queue, or stop its shot loop and free its ComfyUI prompts.
+
+        Coalesced submissions are separate callers, so cancelling one never cancels another.
+        Cancelling a duplicate only detaches it; cancelling a job that still has duplicates
+        attached only tells its own submitter, and the render keeps going for the rest. The
+        render stops once nobody is waiting for it.
+        """
+        primary = self.get(job.coalesced_with) if job.coalesced_with else None
+        if primary is not None and job.request is not None:
+            with self._lock:
+                if job in primary.attached:
+                    primary.attached.remove(job)
+                orphaned = primary.detached_render and not self._live_attached(primary)
+            self._report_cancelled(job)
+            if orphaned:
+                self._stop_render(primary)
+            return
+        if job.request is not None and not job.cancel_event.is_set() and self._live_attached(job):
+            job.detached_render = True
+            self._report_cancelled(job)
+            return
+        self._stop_render(job)
+
+    def _live_attached(self, job: RenderJob) -> list[RenderJob]:
+        return [other for other in job.attached if other.state not in JOB_TERMINAL_STATES]
+
+    def _report_cancelled(self, job: RenderJob) -> None:
+        """Mark one submission cancelled and tell only its own callback URL."""
+        job.state = "cancelled"
+        job.current_step = "cancelled"
+        job.error = "Render job cancelled"
+        job.finished_at = time.time()
+        if job.coalesced_with:
+            job.request_cancel()
+        get_callback_dispatcher().enqueue(
+            job.request.callback_url,
+            job.request.callback_key,
+            "/failed",
+            {"episode_id": job.episode_id, "job_id": job.job_id, "error_message": job.error},
+        )
+        self.save()
+
+    def _stop_render(self, job: RenderJob) -> None:
+        job.request_cancel()
+        if job.request is not None and get_job_scheduler().remove(job.job_id) is not None:
+            send_callback(
+                job.request.callback_url,
+                job.request.callback_key,
+                "/failed",
+                {"episode_id": job.episode_id, "job_id": job.job_id, "error_message": "Render job cancelled"},
+            )
+            return
+        if job.state == "running":
+            job.state = "cancelling"
+        for comfyui_url, prompt_ids in job.prompts_by_node().items():
+            try:
+                cancel_comfy_prompts(comfyui_url, prompt_ids)
+            except Exception as err:
+                print(f"[render-server] could not cancel prompts of job {job.job_id} on {comfyui_url}: {err}")
+        self.save()
+
+    def save(self) -> None:
+        if not self.state_path:
+            return
+        with self._lock:
+            records = [job.describe() for job in self._jobs.values()]
+            try:
+                self.state_path.parent.mkdir(parents=True, exist_ok=True)
+                tmp_path = self.state_path.with_suffix(".tmp")
+                tmp_path.write_text(json.dumps(records), encoding="utf-8")
+                os.replace(tmp_path, self.state_path)
+            except OSError as err:
+                print(f"[render-server] job registry write failed: {err}")
+
+    def _load(self) -> None:
+        if not self.state_path or not self.state_path.exists():
+            return
+        try:
+            records = json.loads(self.state_path.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            return
+        for record in records if isinstance(records, list) else []:
+            if isinstance(record, dict) and record.get("job_id"):
+                job = RenderJob.restore(record)
+                self._jobs[job.job_id] = job
+        self._evict_locked()
+
+    def _evict_locked(self) -> None:
+        finished = [job_id for job_id, job in self._jobs.items() if job.state in JOB_TERMINAL_STATES]
+        for job_id in finished[: max(0, len(finished) - self.max_finished)]:
+            del self._jobs[job_id]
+
+
+_job_registry: RenderJobRegistry | None = None
+_job_registry_lock = threading.Lock()
+
+
+def get_job_registry() -> RenderJobRegistry:
+    global _job_registry
+    with _job_registry_lock:
+        if _job_registry is None:
+            state_path = (os.getenv("RENDER_JOB_REGISTRY_PATH") or "").strip()
+            _job_registry = RenderJobRegistry(
+                max_finished=max(1, parse_int(os.getenv("RENDER_JOB_HISTORY", 100), 100)),
+                state_path=Path(state_path) if state_path else None,
+            )
+        return _job_registry
+
+
+# Set by run_render_pipeline next to _current_job_timings; read by render_single_shot.
+_current_render_job: contextvars.ContextVar[RenderJob | None] = contextvars.ContextVar("render_job", default=None)
+
+
+def submit_render_job(req: RenderRequest, coalesce: bool = True) -> tuple[int | None, RenderJob | None]:
+    """Queue a render job, or attach it to an identical job that is already queued or running.
+
+    Returns the queue position (None when coalesced) and the job it was coalesced with, if any.
+    A job_id that is still queued or running is left alone: JobAlreadyActive carries its record.
+    """
+    registry = get_job_registry()
+    job, primary = registry.register(req, coalesce=coalesce and parse_bool(os.getenv("RENDER_COALESCE_DUPLICATES", "true"), True))
+    if primary is not None:
+        if job.coalesced_with:
+            get_metrics().inc("studioai_render_jobs_coalesced_total")
+            # Catch the new submitter up; later callbacks fan out from send_callback.
+            get_callback_dispatcher().enqueue(
+                req.callback_url,
+                req.callback_key,
+                "/progress",
+                {
+                    "episode_id": req.episode_id,
+                    "job_id": req.job_id,
+                    "progress_percent": primary.progress_percent,
+                    "current_step": f"coalesced_with:{primary.job_id}",
+                },
+            )
+        return None, primary
+    try:
+        return get_job_scheduler().submit(req, parse_job_priority(req.priority), req.workspace_id or req.episode_id), None
+    except SchedulerQueueFull:
+        registry.discard(str(req.job_id))
+        raise
+
+
+@app.on_event("startup")
+def restore_callback_spool() -> None:
+    restored = get_callback_dispatcher().restore_spool()
+    if restored:
+        print(f"[render-server] restored {restored} spooled callback(s)")
+
+
+@app.on_event("startup")
+def start_comfy_prober() -> None:
+    interval = parse_float(os.getenv("COMFYUI_PROBE_INTERVAL_SECONDS", 15), 15.0)
+    if interval > 0:
+        get_comfy_pool().start_prober(max(1.0, interval))
+
+
+@app.on_event("startup")
+def collect_render_workspaces() -> None:
+    evicted = get_workspace_manager().collect_garbage()
+    if evicted:
+        print(f"[render-server] removed {evicted} stale render workspace(s)")
+    artifact_store = get_artifact_store()
+    if isinstance(artifact_store, LocalArtifactStore):
+        evicted = artifact_store.collect_garbage()
+        if evicted:
+            print(f"[render-server] removed {evicted} stale artifact job(s)")
+
+
+@app.on_event("startup")
+def resume_interrupted_jobs() -> None:
+    # Jobs still marked running were cut off by a crash or restart; their manifests let them resume.
+    max_attempts = max(1, parse_int(os.getenv("RENDER_RESUME_MAX_ATTEMPTS", 3), 3))
+    for manifest in get_workspace_manager().manifests():
+        if manifest.status != "running":
+            continue
+        try:
+            req = RenderRequest.model_validate(manifest.data["request"])
+            # Counted before the job runs, so a job that takes the process down still uses up an attempt.
+            attempts = manifest.record_resume_attempt()
+            if attempts > max_attempts:
+                give_up_resuming(req, manifest, attempts - 1)
+                continue
+            submit_render_job(req, coalesce=False)
+        except Exception as err:
+            print(f"[render-server] could not resume job {manifest.data.get('job_id')}: {err}")
+            continue
+        print(f"[render-server] resuming interrupted job {req.job_id} for episode {req.episode_id}")
+
+
+def give_up_resuming(req: RenderRequest, manifest: JobManifest, resumes: int) -> None:
+    error = f"Render job was interrupted after {resumes} resume(s); not resuming it again"
+    manifest.data["error"] = error
+    manifest.finish("failed")
+    job = get_job_registry().get(str(req.job_id))
+    if job is not None:
+        job.state = "failed"
+        job.current_step = "failed"
+        job.error = error
+        job.finished_at = time.time()
+        get_job_registry().save()
+    send_callback(
+        req.callback_url,
+        req.callback_key,
+        "/failed",
+        {"episode_id": req.episode_id, "job_id": req.job_id, "error_message": error},
+    )
+    get_metrics().inc("studioai_render_jobs_total", status="failed")
+    print(f"[render-server] giving up on job {req.job_id} for episode {req.episode_id}: {error}")
+
+
+@app.on_event("shutdown")
+def flush_callbacks() -> None:
+    get_comfy_pool().stop_prober()
+    get_callback_dispatcher().flush(timeout_seconds=5)
+
+
+def get_default_checkpoint_snapshot(comfyui_url: str | None) -> str | None:
+    if not comfyui_url:
+        return None
+    node = get_comfy_pool().get_node(comfyui_url)
+    return fetch_default_checkpoint(comfyui_url, node.checkpoints if node else None)
 
 
 @app.get("/health")
-def health() -> dict[str, Any]:
+def health(refresh: bool = False) -> dict[str, Any]:
     configured_url = os.getenv("COMFYUI_URL")
-    comfyui_url, stats = resolve_comfyui_url(configured_url)
-    default_checkpoint = fetch_default_checkpoint(comfyui_url) if comfyui_url else None
+    comfyui_url, stats = resolve_comfyui_url(refresh=refresh)
+    default_checkpoint = get_default_checkpoint_snapshot(comfyui_url)
     return {
         "status": "ok",
         "comfyui_online": bool(comfyui_url),
         "comfyui_url": comfyui_url or normalize_url(configured_url or DEFAULT_COMFYUI_URLS[0]),
         "comfyui_version": (stats or {}).get("system", {}).get("comfyui_version"),
+        "comfyui_nodes": get_comfy_pool().describe(),
+        "jobs": get_job_scheduler().stats(),
+        "callbacks": get_callback_dispatcher().stats(),
+        "encoder": get_ffmpeg_pool().stats(),
+        "shot_durations": get_shot_duration_stats().describe(),
         "render_mode": "storyboard_keyframes",
         "default_checkpoint": default_checkpoint,
     }
 
 
 @app.get("/comfy/health")
-def comfy_health() -> dict[str, Any]:
-    configured_url = os.getenv("COMFYUI_URL")
-    comfyui_url, stats = resolve_comfyui_url(configured_url)
+def comfy_health(refresh: bool = False) -> dict[str, Any]:
+    comfyui_url, stats = resolve_comfyui_url(refresh=refresh)
     if not comfyui_url:
         raise HTTPException(status_code=503, detail="ComfyUI not reachable")
     return {
         "status": "ok",
         "comfyui_url": comfyui_url,
+        "nodes": get_comfy_pool().describe(),
         "system": (stats or {}).get("system", {}),
         "devices": (stats or {}).get("devices", []),
         "workflow_path": os.getenv("COMFYUI_WORKFLOW_PATH", ""),
         "checkpoint": os.getenv("COMFYUI_CHECKPOINT", ""),
-        "default_checkpoint": fetch_default_checkpoint(comfyui_url),
+        "default_checkpoint": get_default_checkpoint_snapshot(comfyui_url),
     }
 
 
+@app.get("/metrics")
+def metrics_endpoint() -> Response:
+    metrics = get_metrics()
+    jobs = get_job_scheduler().stats()
+    metrics.set("studioai_render_jobs_in_flight", jobs["running"])
+    metrics.set("studioai_render_jobs_pending", jobs["pending"])
+    for node in get_comfy_pool().describe():
+        metrics.set("studioai_render_node_prompts_in_flight", node["inflight"], node=node["url"])
+        metrics.set("studioai_render_node_queue_depth", node["queue_depth"], node=node["url"])
+        metrics.set("studioai_render_node_healthy", 1 if node["healthy"] else 0, node=node["url"])
+    return Response(metrics.render(), media_type="text/plain; version=0.0.4")
+
+
+def require_api_key(x_api_key: str | None) -> None:
+    expected_key = os.getenv("RENDER_API_KEY", "")
+    if expected_key and x_api_key != expected_key:
+        raise HTTPException(status_code=403, detail="Invalid API key")
+
+
+@app.get("/workspaces/usage")
+def workspace_usage(x_api_key: str | None = Header(default=None)) -> dict[str, Any]:
+    require_api_key(x_api_key)
+    usage = get_workspace_manager().usage()
+    artifact_store = get_artifact_store()
+    if isinstance(artifact_store, LocalArtifactStore):
+        usage["artifacts"] = artifact_store.usage()
+    return usage
+
+
+class ArtifactUrlRequest(BaseModel):
+    key: str
+
+
+@app.post("/artifact-urls")
+def issue_artifact_url(body: ArtifactUrlRequest, x_api_key: str | None = Header(default=None)) -> dict[str, Any]:
+    """Fresh signed URL for an artifact (`artifact_key` in /complete metadata), e.g. once the old one expired."""
+    require_api_key(x_api_key)
+    try:
+        size = get_artifact_store().size(body.key)
+    except ValueError:
+        size = None
+    if size is None:
+        raise HTTPException(status_code=404, detail="Artifact not found")
+    return {"key": body.key, "url": artifact_url(body.key), "ttl_seconds": get_artifact_url_ttl_seconds()}
+
+
+@app.api_route("/artifacts/{key:path}", methods=["GET", "HEAD"])
+def get_artifact(
+    key: str,
+    request: Request,
+    expires: int | None = None,
+    signature: str | None = None,
+    x_api_key: str | None = Header(default=None),
+) -> Response:
+    # Browsers cannot send x-api-key from a <video> tag, so a signed URL (see artifact_url) also works.
+    if not verify_artifact_signature(key, expires, signature):
+        require_api_key(x_api_key)
+    store = get_artifact_store()
+    try:
+        size = store.size(key)
+    except ValueError:
+        size = None
+    if size is None:
+        raise HTTPException(status_code=404, detail="Artifact not found")
+
+    headers = {"Accept-Ranges": "bytes"}
+    byte_range = parse_byte_range(request.headers.get("range"), size)
+    if byte_range is None:
+        status_code, start, end = 200, 0, size - 1
+    else:
+        status_code, (start, end) = 206, byte_range
+        headers["Content-Range"] = f"bytes {start}-{end}/{size}"
+    headers["Content-Length"] = str(max(0, end - start + 1))
+    media_type = mimetypes.guess_type(key)[0] or "application/octet-stream"
+    if request.method == "HEAD" or size == 0:
+        return Response(status_code=status_code, headers=headers, media_type=media_type)
+    return StreamingResponse(store.iter_range(key, start, end), status_code=status_code, headers=headers, media_type=media_type)
+
+
+def require_job(job_id: str) -> RenderJob:
+    job = get_job_registry().get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
+
+
+@app.get("/jobs")
+def list_jobs(state: str | None = None, x_api_key: str | None = Header(default=None)) -> dict[str, Any]:
+    require_api_key(x_api_key)
+    return {"jobs": get_job_registry().describe(state), "scheduler": get_job_scheduler().stats()}
+
+
+@app.get("/jobs/{job_id}")
+def get_job(job_id: str, x_api_key: str | None = Header(default=None)) -> dict[str, Any]:
+    require_api_key(x_api_key)
+    return require_job(job_id).describe()
+
+
+@app.post("/jobs/{job_id}/cancel")
+def cancel_job(job_id: str, x_api_key: str | None = Header(default=None)) -> dict[str, Any]:
+    require_api_key(x_api_key)
+    job = require_job(job_id)
+    if job.state in JOB_TERMINAL_STATES:
+        raise HTTPException(status_code=409, detail=f"Job already {job.state}")
+    get_job_registry().cancel(job)
+    return job.describe()
+
+
+@app.get("/jobs/{job_id}/trace")
+def job_trace(job_id: str, x_api_key: str | None = Header(default=None)) -> dict[str, Any]:
+    require_api_key(x_api_key)
+    job = require_job(job_id)
+    if job.timings is None:
+        raise HTTPException(status_code=404, detail="No trace recorded for this job")
+    return job.timings.trace_events()
+
+
 @app.post("/render-full-episode")
 def render_full_episode(
     req: RenderRequest,
-    background_tasks: BackgroundTasks,
     x_api_key: str | None = Header(default=None),
 ) -> dict[str, Any]:
-    expected_key = os.getenv("RENDER_API_KEY", "")
-    if expected_key and x_api_key != expected_key:
-        raise HTTPException(status_code=403, detail="Invalid API key")
+    require_api_key(x_api_key)
+    try:
+        get_workspace_manager().job_dir(req.episode_id, str(req.job_id))
+    except ValueError as err:
+        raise HTTPException(status_code=400, detail=str(err)) from err
 
-    background_tasks.add_task(run_render_pipeline, req)
+    try:
+        queue_position, coalesced_with = submit_render_job(req)
+    except SchedulerQueueFull as err:
+        raise HTTPException(
+            status_code=429,
+            detail="Render queue is full, retry later",
+            headers={"Retry-After": str(err.retry_after_seconds)},
+        ) from err
+    except JobAlreadyActive as err:
+        raise HTTPException(status_code=409, detail={"message": str(err), "job": err.job.describe()}) from err
     return {
         "accepted": True,
         "episode_id": req.episode_id,
         "job_id": req.job_id,
         "shot_count": len(req.storyboard),
         "render_mode": "storyboard_keyframes",
+        "queue_position": queue_position,
+        "coalesced": coalesced_with is not None,
+        "coalesced_with": coalesced_with.job_id if coalesced_with else None,
+    }
+
+
+@app.post("/render-plan")
+def render_plan(
+    req: RenderPlanRequest,
+    x_api_key: str | None = Header(default=None),
+) -> dict[str, Any]:
+    """Compile a render request without rendering it and estimate what running it would cost."""
+    require_api_key(x_api_key)
+    workspace = get_workspace_manager()
+    try:
+        # A plan without a job_id still gets its episode_id checked the way a render would.
+        job_dir = workspace.job_dir(req.episode_id, req.job_id or "plan")
+    except ValueError as err:
+        raise HTTPException(status_code=400, detail=str(err)) from err
+    config = get_render_config(req.render)
+    pool = get_comfy_pool()
+    workflow_template = load_workflow_template()
+    checkpoint: str | None = None
+    if workflow_template is None:
+        primary_node = pool.primary_node()
+        checkpoint = (
+            JobNodeAssets(pool, use_builtin_workflow=True).checkpoint_for(primary_node.url)
+            if primary_node
+            else (os.getenv("COMFYUI_CHECKPOINT") or "").strip() or None
+        )
+
+    reference_errors: dict[str, str] = {}
+
+    def fetch_reference(url: str, index: int) -> CachedReference | None:
+        try:
+            return get_reference_cache().fetch(url)
+        except Exception as err:
+            reference_errors[url] = str(err)
+            return None
+
+    plan = compile_render_plan(req, config, workflow_template, checkpoint, fetch_reference)
+
+    # Same reuse rules as run_render_pipeline: this job's own frames, or with `resume` any
+    # earlier job of the episode, then the keyframe cache (single-take jobs only).
+    manifests = workspace.manifests(req.episode_id) if req.resume else []
+    own_manifest = JobManifest.load(job_dir) if req.job_id else None
+    resumable = {key for manifest in [own_manifest, *manifests] if manifest for key in manifest.rendered_takes()}
+    keyframe_cache = get_keyframe_cache() if config["keyframe_cache"] and int(config["takes_per_shot"]) == 1 else None
+
+    stats = get_shot_duration_stats()
+    shots: list[dict[str, Any]] = []
+    gpu_seconds = 0.0
+    to_render = 0
+    unestimated = 0
+    upload_hashes: set[str] = set()
+    for planned in plan.shots:
+        if planned.cache_key and planned.cache_key in resumable:
+            expected = "resumed"
+        elif keyframe_cache and planned.cache_key and keyframe_cache.contains(planned.cache_key):
+            expected = "cached"
+        else:
+            expected = "render"
+            to_render += 1
+            seconds = stats.percentile(ShotDurationStats.ALL_NODES, planned.workflow_variant, 50, min_samples=1)
+            if seconds is None:
+                unestimated += 1
+            else:
+                gpu_seconds += seconds
+            if planned.reference_sha256:
+                upload_hashes.add(planned.reference_sha256)
+        shots.append({**planned.describe(), "expected": expected})
+
+    return {
+        "episode_id": plan.episode_id,
+        "job_id": plan.job_id,
+        "workflow": "custom" if workflow_template is not None else "builtin",
+        "checkpoint": checkpoint,
+        "config": config,
+        "shots": shots,
+        "reference_errors": [{"url": url, "error": error} for url, error in reference_errors.items()],
+        "estimate": {
+            "shots": len(shots),
+            "shots_to_render": to_render,
+            "expected_cache_hits": sum(1 for shot in shots if shot["expected"] == "cached"),
+            "expected_resumed_shots": sum(1 for shot in shots if shot["expected"] == "resumed"),
+            # Median recent ComfyUI time per prompt for each shot's variant, summed over the shots to render.
+            "gpu_seconds": round(gpu_seconds, 1) if unestimated < to_render or not to_render else None,
+            "unestimated_shots": unestimated,
+            "unique_references": len({ref.sha256 for ref in plan.references.values()}),
+            "unique_reference_uploads": sum(
+                1 for sha256 in upload_hashes if not any(pool.uploaded_reference(node, sha256) for node in pool.nodes)
+            ),
+        },
     }